@@ -0,0 +1,34 @@
+"""Shared helpers for the benchmark scripts."""
+
+import glob
+import os
+import sys
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_DIR = os.path.join(ROOT, "train", "Eczema Photos")
+
+# (label, width, height) from thumbnail to a 12 MP phone photo
+RESOLUTIONS = (("thumb", 160, 120), ("vga", 640, 480), ("1080p", 1920, 1440), ("12mp", 4032, 3024))
+
+
+def sample_images(limit=None):
+    paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, "*.jpg")))[:limit]
+    return [cv2.imread(path) for path in paths]
+
+
+def encode_at(image, width, height, quality=90):
+    # JPEG bytes of `image` resampled to width x height, as a phone upload would arrive
+    resized = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def percentiles(seconds):
+    values = np.asarray(seconds) * 1e3
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(values.mean()),
+            "samples": len(values)}
@@ -0,0 +1,73 @@
+"""Query latency and recall of the embedding index at 100k vectors.
+
+    python benchmarks/embedding_index.py --vectors 100000 --dim 128
+
+Synthetic unit-norm embeddings drawn around a few hundred cluster centers (as
+real image features are) are written with ``write_index`` into a temporary
+directory and reopened through the memory-mapped loader.  Reports load time,
+file size, p50/p99 query latency for the exact scan (nprobe=0) and for IVF at
+several nprobe values, and IVF's recall@k against the exact scan.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from _common import percentiles
+
+from dermacare.embedding_index import EmbeddingIndex, write_index  # noqa: E402
+
+
+def synthetic(count, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    data = synthetic(args.vectors + args.queries, args.dim, args.clusters, seed=0)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    items = [[f"{i}.jpg", "synthetic", 0, 0, f"{i:064x}"] for i in range(args.vectors)]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        start = time.perf_counter()
+        write_index(index_dir, vectors, items, model="synthetic", root=index_dir)
+        print(f"build: {time.perf_counter() - start:.1f}s, "
+              f"{os.path.getsize(os.path.join(index_dir, 'vectors.f16')) / 2 ** 20:.1f} MiB of vectors")
+        start = time.perf_counter()
+        index = EmbeddingIndex(index_dir)
+        print(f"load: {(time.perf_counter() - start) * 1e3:.1f} ms for {len(index)} vectors")
+
+        exact = []
+        for nprobe in [0] + args.nprobe:
+            index.search(queries[0], args.k, nprobe)
+            timings, found = [], []
+            for query in queries:
+                start = time.perf_counter()
+                matches = index.search(query, args.k, nprobe)
+                timings.append(time.perf_counter() - start)
+                found.append({match.path for match in matches})
+            if nprobe == 0:
+                exact = found
+            recall = np.mean([len(a & b) / len(b) for a, b in zip(found, exact)])
+            stats = percentiles(timings)
+            label = "exact" if nprobe == 0 else f"nprobe {nprobe}"
+            print(f"{label:<10} p50 {stats['p50_ms']:7.3f} ms  p99 {stats['p99_ms']:7.3f} ms  "
+                  f"recall@{args.k} {recall:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare the compiled inference engine with the original ``model.predict`` path.
+
+    python benchmarks/inference_engine.py --model skin_disease_classification_model.h5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+from tensorflow import keras
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dermacare.inference import InferenceEngine  # noqa: E402
+
+
+def legacy_predict_disease(model, image):
+    # The pre-engine implementation from main.py
+    img = cv2.resize(image, (64, 64))
+    img = np.reshape(img, (1, 64, 64, 3))
+    img = img / 255.0
+    return model.predict(img, verbose=0)[0]
+
+
+def engine_predict_disease(engine, image):
+    img = cv2.resize(image, (64, 64)).astype(np.float32) / 255.0
+    return engine.predict(img)[0]
+
+
+def time_calls(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="skin_disease_classification_model.h5")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    # Cold: the first call on a freshly loaded model, including engine tracing
+    model = keras.models.load_model(args.model, compile=False)
+    legacy_cold = time_calls(lambda: legacy_predict_disease(model, image), 1)[0]
+    legacy_warm = time_calls(lambda: legacy_predict_disease(model, image), args.runs)
+
+    model = keras.models.load_model(args.model, compile=False)
+    start = time.perf_counter()
+    engine = InferenceEngine(model)
+    engine_predict_disease(engine, image)
+    engine_cold = time.perf_counter() - start
+    engine_warm = time_calls(lambda: engine_predict_disease(engine, image), args.runs)
+
+    diff = np.abs(legacy_predict_disease(model, image) - engine_predict_disease(engine, image)).max()
+
+    print(f"{'path':<16}{'cold ms':>10}{'warm p50 ms':>14}{'warm mean ms':>14}")
+    for name, cold, warm in (("model.predict", legacy_cold, legacy_warm),
+                             ("engine", engine_cold, engine_warm)):
+        print(f"{name:<16}{cold * 1e3:>10.2f}{statistics.median(warm) * 1e3:>14.3f}"
+              f"{statistics.fmean(warm) * 1e3:>14.3f}")
+    print(f"speed-up (warm p50): {statistics.median(legacy_warm) / statistics.median(engine_warm):.1f}x, "
+          f"max |prob diff|: {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
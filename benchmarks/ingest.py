@@ -0,0 +1,67 @@
+"""Compare full-resolution decoding with downscale-on-decode ingestion.
+
+    python benchmarks/ingest.py [image.jpg ...]
+
+Without arguments a synthetic 12 MP JPEG is used.  Memory is the peak of
+NumPy/OpenCV array allocations reported by tracemalloc.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dermacare.ingest import ingest  # noqa: E402
+
+
+def full_decode(data):
+    # The original main.py path: decode at full size, then resize for the model
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), 1)
+    return cv2.resize(image, (64, 64))
+
+
+def measure(fn, data, runs):
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(data)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), peak
+
+
+def synthetic_jpeg(width=4032, height=3024):
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(cv2.resize(small, (width, height)), (0, 0), 3)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    inputs = [(path, open(path, "rb").read()) for path in args.images] or [("synthetic 4032x3024", synthetic_jpeg())]
+    for name, data in inputs:
+        full_time, full_peak = measure(full_decode, data, args.runs)
+        fast_time, fast_peak = measure(ingest, data, args.runs)
+        print(f"{name} ({len(data) / 2 ** 20:.1f} MB)")
+        print(f"  full decode : {full_time * 1e3:8.1f} ms  peak {full_peak / 2 ** 20:7.1f} MiB")
+        print(f"  ingest      : {fast_time * 1e3:8.1f} ms  peak {fast_peak / 2 ** 20:7.1f} MiB")
+        print(f"  speed-up {full_time / fast_time:.1f}x, memory {full_peak / max(fast_peak, 1):.1f}x lower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Simulate N concurrent users of the Prediction page.
+
+    python benchmarks/load_generator.py --sessions 8 --requests 20
+    python benchmarks/load_generator.py --mode apptest --sessions 4 --requests 5
+
+Each session uploads a fresh photo (random trailing bytes defeat the
+prediction cache, as distinct users' photos would), then predicts and looks up
+the recommendation.  ``--mode pipeline`` calls the same functions as main.py
+from threads; ``--mode apptest`` re-runs the whole script through Streamlit's
+AppTest with the menu, uploader and Predict button patched, which includes
+Streamlit's own overhead.  Reports throughput, latency percentiles, errors and
+the batch sizes the shared batcher formed, optionally as JSON.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import ROOT, RESOLUTIONS, encode_at, percentiles, sample_images
+
+from dermacare import config, pipeline  # noqa: E402
+from dermacare.batching import get_batcher  # noqa: E402
+from dermacare.ingest import ingest  # noqa: E402
+from dermacare.memory import peak_rss  # noqa: E402
+from dermacare.recommendations import get_recommendation  # noqa: E402
+
+
+def unique_upload(payloads):
+    # JPEG decoders stop at the end-of-image marker, so trailing bytes change the cache key only
+    return random.choice(payloads) + os.urandom(16)
+
+
+def pipeline_session(payloads, model_path):
+    def request():
+        data = unique_upload(payloads)
+        upload = ingest(data)
+        result = pipeline.predict_disease(upload.model_input, data, model_path)
+        if not result.abstained:
+            get_recommendation(result.predicted_class)
+    return request
+
+
+def apptest_session(payloads, model_path):
+    from unittest.mock import MagicMock
+
+    import streamlit as st
+    import streamlit_option_menu
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1 import AppTest
+
+    class Upload(io.BytesIO):
+        # Stands in for Streamlit's UploadedFile, which the page keys its decoded copy by
+        def __init__(self, data):
+            super().__init__(data)
+            self.file_id = os.urandom(8).hex()
+
+    # AppTest installs a mock Runtime for each run and clears it when the run ends, under any concurrent
+    # session's feet; pin one that all sessions share
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    # The page opens its Lottie files relative to the working directory, as under `streamlit run main.py`
+    os.chdir(ROOT)
+    # Patched once for every session: the Prediction page, a new photo per run and Predict clicked
+    streamlit_option_menu.option_menu = lambda *args, **kwargs: "Prediction"
+    st.file_uploader = lambda *args, **kwargs: Upload(unique_upload(payloads))
+    st.button = lambda label, *args, **kwargs: label == "Predict"
+
+    def request():
+        at = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=300).run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        if at.error:
+            # e.g. a missing label manifest stops the page before Predict
+            raise RuntimeError(at.error[0].value)
+    return request
+
+
+def mean_batch_size(before, after):
+    batches = after["count"] - before["count"]
+    return (after["sum"] - before["sum"]) / batches if batches else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("pipeline", "apptest"), default="pipeline")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=20, help="predictions per session")
+    parser.add_argument("--resolution", choices=[label for label, _, _ in RESOLUTIONS], default="1080p")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a session's requests")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    # The page reads config.MODEL_PATH on each run (the environment variable was consumed at import), and
+    # apptest mode changes directory before it does
+    args.model = config.MODEL_PATH = os.path.abspath(args.model)
+    _, width, height = next(r for r in RESOLUTIONS if r[0] == args.resolution)
+    payloads = [encode_at(image, width, height) for image in sample_images(16)]
+    make_session = pipeline_session if args.mode == "pipeline" else apptest_session
+    request = make_session(payloads, args.model)
+    request()  # load and warm the model outside the measurement
+
+    timings, errors = [], []
+    lock = threading.Lock()
+
+    def session():
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            try:
+                request()
+            except Exception as exc:
+                with lock:
+                    errors.append(repr(exc))
+            else:
+                with lock:
+                    timings.append(time.perf_counter() - start)
+            time.sleep(args.think_ms / 1e3)
+
+    batcher_before = get_batcher(args.model).stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.sessions) as pool:
+        for future in [pool.submit(session) for _ in range(args.sessions)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    batcher = get_batcher(args.model).stats()
+
+    report = {
+        "mode": args.mode,
+        "sessions": args.sessions,
+        "resolution": args.resolution,
+        "elapsed_seconds": elapsed,
+        "requests_per_second": len(timings) / elapsed,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "latency": percentiles(timings) if timings else None,
+        "mean_batch_size": mean_batch_size(batcher_before["batch_size"], batcher["batch_size"]),
+        "peak_rss_mb": peak_rss() / 2 ** 20,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Reproducible benchmark of the Prediction page's code path.
+
+    python benchmarks/prediction_path.py --output bench.json
+    python benchmarks/prediction_path.py --compare bench.json
+
+Drives the same functions as main.py over the images in train/Eczema Photos,
+re-encoded at thumbnail to 12 MP resolutions:
+
+* decode: the original ``cv2.imdecode`` versus ``dermacare.ingest``
+* inference: preprocessing plus a forward pass at batch sizes 1..64
+* end_to_end: ingest, ``pipeline.predict_disease`` (cache miss and hit) and
+  the recommendation lookup
+
+Each row reports p50/p95/p99 latency, throughput and the peak of traced
+array allocations; the process peak RSS is in ``meta``.  ``--compare``
+prints the p50 change of every row against an earlier JSON report.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from _common import RESOLUTIONS, encode_at, percentiles, sample_images
+
+from dermacare import config, pipeline  # noqa: E402
+from dermacare.inference import get_engine  # noqa: E402
+from dermacare.ingest import ingest  # noqa: E402
+from dermacare.memory import peak_rss  # noqa: E402
+from dermacare.preprocessing import Preprocessor  # noqa: E402
+from dermacare.recommendations import get_recommendation  # noqa: E402
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+
+def run(fn, inputs, repeat):
+    # Time fn over every input `repeat` times; returns latency stats, throughput and traced peak memory
+    fn(inputs[0])
+    tracemalloc.start()
+    timings = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            t = time.perf_counter()
+            fn(item)
+            timings.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(percentiles(timings), per_second=len(timings) / elapsed, peak_traced_mb=peak / 2 ** 20)
+
+
+def bench_decode(uploads, repeat):
+    rows = []
+    for label, payloads in uploads.items():
+        rows.append(dict(scenario="decode", impl="cv2.imdecode", resolution=label,
+                         **run(lambda data: cv2.imdecode(np.frombuffer(data, np.uint8), 1), payloads, repeat)))
+        rows.append(dict(scenario="decode", impl="ingest", resolution=label, **run(ingest, payloads, repeat)))
+    return rows
+
+
+def bench_inference(images, model_path, repeat):
+    engine = get_engine(model_path)
+    rows = []
+    for batch_size in BATCH_SIZES:
+        preprocessor = Preprocessor(batch_size)
+        batches = [[images[(i + j) % len(images)] for j in range(batch_size)] for i in range(0, len(images), 8)]
+        stats = run(lambda batch: engine.predict(preprocessor(batch)), batches, repeat)
+        stats["images_per_second"] = stats["per_second"] * batch_size
+        rows.append(dict(scenario="inference", impl=type(engine).__name__, batch_size=batch_size, **stats))
+    return rows
+
+
+def bench_end_to_end(uploads, model_path, repeat):
+    rows = []
+    counter = iter(range(sys.maxsize))
+
+    def predict(data, cache_key):
+        upload = ingest(data)
+        result = pipeline.predict_disease(upload.model_input, cache_key, model_path)
+        if not result.abstained:
+            get_recommendation(result.predicted_class)
+        return result
+
+    for label, payloads in uploads.items():
+        # A fresh cache key per call forces the full path; reusing the bytes measures the cache hit path
+        miss = run(lambda data: predict(data, data + next(counter).to_bytes(8, "little")), payloads, repeat)
+        hit = run(lambda data: predict(data, data), payloads, repeat)
+        rows.append(dict(scenario="end_to_end", impl="cache_miss", resolution=label, **miss))
+        rows.append(dict(scenario="end_to_end", impl="cache_hit", resolution=label, **hit))
+    return rows
+
+
+def row_key(row):
+    return (row["scenario"], row["impl"], row.get("resolution", ""), row.get("batch_size", ""))
+
+
+def compare(rows, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {row_key(row): row for row in json.load(f)["rows"]}
+    print(f"{'scenario':<12}{'impl':<16}{'variant':>8}{'base p50':>12}{'p50':>10}{'change':>9}")
+    for row in rows:
+        base = baseline.get(row_key(row))
+        if base is None:
+            continue
+        change = row["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else float("nan")
+        print(f"{row['scenario']:<12}{row['impl']:<16}{str(row_key(row)[2] or row_key(row)[3]):>8}"
+              f"{base['p50_ms']:>12.3f}{row['p50_ms']:>10.3f}{change:>+9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--images", type=int, default=16, help="number of sample images to use")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to compare p50 latencies against")
+    args = parser.parse_args()
+
+    images = sample_images(args.images)
+    uploads = {label: [encode_at(image, width, height) for image in images] for label, width, height in RESOLUTIONS}
+    model_inputs = [ingest(data).model_input for data in uploads["vga"]]
+
+    rows = bench_decode(uploads, args.repeat)
+    rows += bench_inference(model_inputs, args.model, args.repeat)
+    rows += bench_end_to_end(uploads, args.model, args.repeat)
+
+    report = {
+        "meta": {
+            "model": args.model,
+            "images": len(images),
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "peak_rss_mb": peak_rss() / 2 ** 20,
+        },
+        "rows": rows,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(rows, args.compare)
+    else:
+        for row in rows:
+            variant = row.get("resolution", row.get("batch_size"))
+            print(f"{row['scenario']:<12}{row['impl']:<16}{str(variant):>8}  p50 {row['p50_ms']:8.3f} ms  "
+                  f"p99 {row['p99_ms']:8.3f} ms  {row.get('images_per_second', row['per_second']):9.1f}/s  "
+                  f"peak {row['peak_traced_mb']:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Microbenchmark and parity check for the preprocessing kernel.
+
+    python benchmarks/preprocessing.py
+
+Checks the buffered ``np.divide`` implementation against the original
+``predict_disease`` preprocessing (exits non-zero on a mismatch), then times
+both for single images and batches.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dermacare.preprocessing import Preprocessor, preprocess  # noqa: E402
+
+
+def legacy_preprocess(image):
+    # The original main.py implementation
+    img = cv2.resize(image, (64, 64))
+    img = np.reshape(img, (1, 64, 64, 3))
+    return img / 255.0
+
+
+def check_parity(images):
+    for image in images:
+        expected = legacy_preprocess(image)[0]
+        np.testing.assert_allclose(preprocess(image, "BGR"), expected, rtol=0, atol=1e-7)
+        np.testing.assert_allclose(preprocess(image, "RGB"), expected[..., ::-1], rtol=0, atol=1e-7)
+    batch = Preprocessor(len(images), "BGR")(images)
+    np.testing.assert_allclose(batch, np.concatenate([legacy_preprocess(i) for i in images]), rtol=0, atol=1e-7)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, shape, dtype=np.uint8)
+              for shape in ((480, 640, 3), (64, 64, 3), (1024, 768, 3), (200, 200, 3))]
+    check_parity(images)
+    print("parity with legacy preprocessing: OK (BGR and RGB, max abs error <= 1e-7)")
+
+    def report(name, fn, n_images):
+        seconds = min(timeit.repeat(fn, number=args.number, repeat=3)) / args.number
+        print(f"  {name:<34}{seconds * 1e6:10.1f} us/call {seconds * 1e6 / n_images:10.1f} us/image")
+
+    for label, image in (("640x480 input", images[0]), ("64x64 input (from ingest)", images[1])):
+        print(label)
+        report("legacy (float64)", lambda: legacy_preprocess(image), 1)
+        report("preprocess()", lambda: preprocess(image), 1)
+        for batch_size in (1, 16, 64):
+            batch = [image] * batch_size
+            preprocessor = Preprocessor(batch_size)
+            report(f"legacy x{batch_size} + np.concatenate",
+                   lambda: np.concatenate([legacy_preprocess(i) for i in batch]), batch_size)
+            report(f"Preprocessor batch of {batch_size}", lambda: preprocessor(batch), batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Cold-start time-to-first-render and RSS for each page of the app.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --eager-imports   # simulate top-level TF/cv2 imports
+
+Each page is rendered once with Streamlit's AppTest in a fresh interpreter,
+with the sidebar menu patched to return that page.  Pre-warming is disabled
+so the numbers reflect the page itself.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ("Home", "Prediction", "Contact")
+
+_CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+page, eager = sys.argv[1], sys.argv[2] == "1"
+if eager:
+    import cv2
+    from tensorflow import keras
+import streamlit_option_menu
+streamlit_option_menu.option_menu = lambda *args, **kwargs: page
+from streamlit.testing.v1 import AppTest
+from dermacare.memory import current_rss, peak_rss
+at = AppTest.from_file("main.py", default_timeout=300).run()
+print(json.dumps({
+    "page": page,
+    "first_render_seconds": time.perf_counter() - start,
+    "rss_mb": current_rss() / 2 ** 20,
+    "peak_rss_mb": peak_rss() / 2 ** 20,
+    "tensorflow_loaded": "tensorflow" in sys.modules,
+    "exception": at.exception[0].message.splitlines()[0] if at.exception else None,
+}))
+"""
+
+
+def measure(page, eager):
+    env = dict(os.environ, DERMACARE_PREWARM="0", TF_CPP_MIN_LOG_LEVEL="3")
+    result = subprocess.run([sys.executable, "-c", _CHILD, page, "1" if eager else "0"], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--eager-imports", action="store_true",
+                        help="import TensorFlow and OpenCV up front, as main.py did before lazy loading")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print raw JSON rows")
+    args = parser.parse_args()
+
+    print(f"{'page':<12}{'first render s':>16}{'RSS MB':>10}{'peak MB':>10}{'TF loaded':>11}")
+    for page in PAGES:
+        rows = [measure(page, args.eager_imports) for _ in range(args.repeat)]
+        best = min(rows, key=lambda row: row["first_render_seconds"])
+        if args.json:
+            print(json.dumps(best))
+        print(f"{page:<12}{best['first_render_seconds']:>16.2f}{best['rss_mb']:>10.0f}{best['peak_rss_mb']:>10.0f}"
+              f"{str(best['tensorflow_loaded']):>11}" + (f"  ({best['exception']})" if best["exception"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Latency and accuracy of test-time augmentation against a single pass.
+
+    python benchmarks/tta.py --limit 200 --output tta.json
+
+Every image under train/<class>/ is decoded the way the Streamlit page
+decodes uploads and predicted three ways: a single pass, TTA on every image,
+and TTA only where the single pass falls below the abstain threshold.  TTA
+views are preprocessed into one batch, so each image costs one forward pass
+in every mode.  Reports accuracy, abstention rate, the share of images
+escalated to TTA and per-image latency.
+
+First, ``lesion_box`` is checked on synthetic 4032x3024 photos: a dark lesion
+of each of ``LESION_DIAMETERS`` pixels (0 for none) on textured skin, decoded
+with ``decode_source`` like an upload.  A lesion counts as found when the box
+contains its centre; on lesion-free skin, no box should be returned.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from _common import ROOT, percentiles
+
+from dermacare import config, tta  # noqa: E402
+from dermacare.batch_predict import iter_image_paths  # noqa: E402
+from dermacare.inference import get_engine  # noqa: E402
+from dermacare.ingest import decode, decode_source, to_model_input  # noqa: E402
+from dermacare.labels import load_labels  # noqa: E402
+from dermacare.postprocess import load_temperature, postprocess  # noqa: E402
+from dermacare.preprocessing import Preprocessor  # noqa: E402
+
+LESION_DIAMETERS = (0, 60, 120, 250, 400)
+PHOTO_SIZE = (4032, 3024)
+
+
+def synthetic_photo(diameter, rng):
+    # JPEG bytes of skin-toned noise with a dark disc of `diameter` px, and the disc's centre
+    width, height = PHOTO_SIZE
+    image = np.clip(np.array([150, 170, 215], np.float32) + rng.normal(0, 6, (height, width, 1)), 0, 255)
+    center = int(width * rng.uniform(0.3, 0.7)), int(height * rng.uniform(0.3, 0.7))
+    if diameter:
+        cv2.circle(image, center, diameter // 2, (60, 70, 100), -1)
+    _, data = cv2.imencode(".jpg", image.astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return data.tobytes(), center
+
+
+def lesion_detection(trials=5, seed=0):
+    # {diameter: share of photos where lesion_box found the lesion (or, for 0, returned no box)}
+    rng = np.random.default_rng(seed)
+    found = {}
+    for diameter in LESION_DIAMETERS:
+        hits = 0
+        for _ in range(trials):
+            data, (cx, cy) = synthetic_photo(diameter, rng)
+            source = decode_source(data)
+            box = tta.lesion_box(source)
+            if not diameter:
+                hits += box is None
+                continue
+            scale = source.shape[1] / PHOTO_SIZE[0]
+            hits += box is not None and (box[0] <= cx * scale <= box[0] + box[2]
+                                         and box[1] <= cy * scale <= box[1] + box[2])
+        found[diameter] = hits / trials
+    return found
+
+
+def load_examples(data_dir, class_names, limit):
+    examples = []
+    for label, name in enumerate(class_names):
+        directory = os.path.join(data_dir, name)
+        if not os.path.isdir(directory):
+            continue
+        for path in list(iter_image_paths([directory]))[:limit]:
+            with open(path, "rb") as f:
+                examples.append((decode(f.read(), min_side=config.DISPLAY_WIDTH), label))
+    return examples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir", nargs="?", default=os.path.join(ROOT, "train"))
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--limit", type=int, default=100, help="images per class")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    detection = lesion_detection()
+    print("lesion_box on 4032x3024 photos: " + "  ".join(
+        f"{diameter or 'none'}{' px' if diameter else ''} {share:.0%}" for diameter, share in detection.items()))
+
+    engine = get_engine(args.model)
+    class_names = load_labels(args.model, engine.num_classes)
+    temperature = load_temperature(args.model)
+    examples = load_examples(args.data_dir, class_names, args.limit)
+    if not examples:
+        parser.error(f"no images for the model's classes under {args.data_dir}")
+    preprocessor = Preprocessor(16)
+
+    def single(source):
+        return engine.predict(preprocessor([to_model_input(source)]))[0]
+
+    def augmented(source):
+        return tta.combine(engine.predict(preprocessor(tta.views(source))))
+
+    def uncertain(source):
+        prediction = single(source)
+        result = postprocess(prediction, class_names, temperature=temperature)[0]
+        return augmented(source) if result.abstained else prediction
+
+    rows = []
+    for mode, predict in (("single", single), ("always", augmented), ("uncertain", uncertain)):
+        predict(examples[0][0])
+        timings, predictions = [], []
+        for source, _ in examples:
+            start = time.perf_counter()
+            predictions.append(predict(source))
+            timings.append(time.perf_counter() - start)
+        results = postprocess(np.stack(predictions), class_names, temperature=temperature)
+        labels = [label for _, label in examples]
+        rows.append(dict(
+            mode=mode,
+            accuracy=float(np.mean([class_names.index(r.predicted_class) == y for r, y in zip(results, labels)])),
+            abstain_rate=float(np.mean([r.abstained for r in results])),
+            **percentiles(timings),
+        ))
+
+    escalated = np.mean([postprocess(single(source), class_names, temperature=temperature)[0].abstained
+                         for source, _ in examples])
+    print(f"{len(examples)} images, {len(class_names)} classes, {float(escalated):.0%} escalated in 'uncertain' mode")
+    for row in rows:
+        print(f"{row['mode']:<10} accuracy {row['accuracy']:6.1%}  abstain {row['abstain_rate']:6.1%}  "
+              f"p50 {row['p50_ms']:7.2f} ms  p95 {row['p95_ms']:7.2f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"images": len(examples), "escalated": float(escalated), "rows": rows,
+                       "lesion_detection": detection}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Throughput scaling of the inference worker pool with the number of workers.
+
+    python benchmarks/worker_pool.py
+    python benchmarks/worker_pool.py --workers 1 2 4 8 --batch-size 16 --output pool.json
+
+For each pool size, every worker gets ``--threads`` intra-op threads and the
+pool is kept saturated with batches of preprocessed 64x64 images for
+``--seconds``; the in-process engine with TensorFlow's default thread pools is
+the baseline.  Near-linear scaling shows up as an efficiency (speedup divided
+by workers) close to 1, up to the number of physical cores.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from _common import sample_images
+
+from dermacare import config  # noqa: E402
+from dermacare.inference import get_engine  # noqa: E402
+from dermacare.preprocessing import Preprocessor  # noqa: E402
+from dermacare.worker_pool import WorkerPool  # noqa: E402
+
+
+def saturate(predict, images, seconds, clients):
+    # Run `predict(images)` from `clients` threads for `seconds`; returns images per second
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        count = 0
+        while time.perf_counter() < deadline:
+            predict(images)
+            count += len(images)
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        total = sum(pool.map(lambda _: client(), range(clients)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, *(2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores), cores}))
+    parser.add_argument("--threads", type=int, default=1, help="intra-op threads per worker")
+    parser.add_argument("--batch-size", type=int, default=config.BATCH_MAX_SIZE)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    images = [cv2.resize(image, (config.IMAGE_SIZE, config.IMAGE_SIZE), interpolation=cv2.INTER_AREA)
+              for image in sample_images(args.batch_size)]
+    images = (images * args.batch_size)[:args.batch_size]
+
+    engine = get_engine(args.model)
+    preprocessor = Preprocessor(args.batch_size)
+    baseline = saturate(lambda batch: engine.predict(preprocessor(batch)), images, args.seconds, 1)
+    print(f"in-process engine: {baseline:9.1f} images/s")
+
+    rows = []
+    for workers in args.workers:
+        pool = WorkerPool(args.model, workers=workers, intra_op_threads=args.threads,
+                          max_batch_size=args.batch_size)
+        try:
+            pool.predict(images)
+            # Two clients per worker keep every worker busy while the next batch is preprocessed
+            throughput = saturate(pool.predict, images, args.seconds, 2 * workers)
+        finally:
+            pool.close()
+        if not rows:
+            single = throughput
+        row = {"workers": workers, "threads_per_worker": args.threads, "images_per_second": throughput,
+               "speedup": throughput / single, "efficiency": throughput / single / workers}
+        rows.append(row)
+        print(f"{workers:3d} workers: {throughput:9.1f} images/s  speedup {row['speedup']:5.2f}  "
+              f"efficiency {row['efficiency']:4.0%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cores": cores, "batch_size": args.batch_size, "in_process_images_per_second": baseline,
+                       "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
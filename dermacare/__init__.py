@@ -0,0 +1 @@
+"""Model serving helpers for the DermaCare Streamlit app."""
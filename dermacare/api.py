@@ -0,0 +1,218 @@
+"""Standalone async HTTP inference API.
+
+    python -m dermacare.api --port 8000
+
+    curl --data-binary @photo.jpg http://127.0.0.1:8000/predict
+    curl -F a=@one.jpg -F b=@two.jpg http://127.0.0.1:8000/predict
+
+``POST /predict`` takes either one image as the raw request body or several
+as a multipart form, and answers with the same top-k result as the Streamlit
+page.  ``GET /healthz`` reports whether the model is loaded and ``GET
+/metrics`` serves the Prometheus metrics.  Tornado (already installed with
+Streamlit) runs the event loop; decoding, cache lookups and postprocessing run
+on a small dedicated thread pool and inference on the shared micro-batcher,
+whose future is awaited, so the loop never blocks.  Images in flight are capped and
+requests beyond the cap are refused with 503 instead of queueing.
+"""
+
+import argparse
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.web
+
+from dermacare import config, pipeline, tta
+from dermacare.batching import get_batcher
+from dermacare.ingest import UploadRejected, decode_source, to_model_input
+from dermacare.metrics import counter, render_prometheus, timer
+from dermacare.model_registry import model_version
+from dermacare.postprocess import Result
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceService:
+    def __init__(self, model_path=config.MODEL_PATH, max_inflight=config.API_MAX_INFLIGHT,
+                 decode_workers=config.API_DECODE_WORKERS):
+        self.model_path = model_path
+        self.max_inflight = max_inflight
+        self.inflight = 0  # only touched from the event loop
+        self.error = None
+        self.ready = False
+        self._executor = ThreadPoolExecutor(decode_workers, thread_name_prefix="dermacare-api")
+
+    async def load(self):
+        # Load the model, its labels and the batcher off the loop; /healthz reports the outcome
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, pipeline.class_names, self.model_path)
+            await loop.run_in_executor(self._executor, get_batcher, self.model_path)
+        except Exception as exc:
+            logger.exception("Failed to load %s", self.model_path)
+            self.error = str(exc)
+        else:
+            self.ready = True
+
+    def try_acquire(self, count):
+        if self.inflight + count > self.max_inflight:
+            return False
+        self.inflight += count
+        return True
+
+    def release(self, count):
+        self.inflight -= count
+
+    def _prepare(self, data):
+        # Runs on the decode pool.  Decodes at the Streamlit page's scale so that both compute the same model
+        # input for the cache key they share; the source is kept for test-time augmentation.
+        key, prediction = pipeline.lookup(data, self.model_path)
+        if prediction is not None and config.TTA == "off":
+            return None, None, key, prediction
+        with timer("decode"):
+            source = decode_source(data)
+        return source, to_model_input(source), key, prediction
+
+    def _result(self, prediction):
+        # Postprocessing reads the labels, which reload the model if its file changed
+        return asyncio.get_running_loop().run_in_executor(self._executor, pipeline.result, prediction,
+                                                           self.model_path)
+
+    async def predict(self, data):
+        loop = asyncio.get_running_loop()
+        source, image, key, prediction = await loop.run_in_executor(self._executor, self._prepare, data)
+        if config.TTA == "always":
+            return await self._predict_tta(source, data)
+        if prediction is None:
+            prediction = await asyncio.wrap_future(get_batcher(self.model_path).submit(image))
+            await loop.run_in_executor(self._executor, pipeline.store, key, prediction)
+        result = await self._result(prediction)
+        if tta.wants_tta(result):
+            return await self._predict_tta(source, data)
+        return result
+
+    async def _predict_tta(self, source, data):
+        loop = asyncio.get_running_loop()
+        key, prediction = await loop.run_in_executor(self._executor, pipeline.lookup, data, self.model_path, ":tta")
+        if prediction is None:
+            views = await loop.run_in_executor(self._executor, tta.views, source)
+            batcher = get_batcher(self.model_path)
+            outputs = await asyncio.gather(*(asyncio.wrap_future(batcher.submit(view)) for view in views))
+            prediction = tta.combine(outputs)
+            await loop.run_in_executor(self._executor, pipeline.store, key, prediction)
+        return await self._result(prediction)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def result_json(result):
+    # Same fields as the batch CLI's JSONL rows
+    return {
+        "predicted_class": result.predicted_class,
+        "confidence": result.confidence,
+        "abstained": result.abstained,
+        "top_k": [{"class": name, "probability": p} for name, p in zip(result.classes, result.probabilities)],
+    }
+
+
+class _Handler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def fail(self, status, message, retry_after=None):
+        # JSON error body; the message can be arbitrary text, unlike an HTTP reason phrase
+        self.set_status(status)
+        if retry_after is not None:
+            self.set_header("Retry-After", str(retry_after))
+        self.finish({"error": message})
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+    def on_finish(self):
+        counter("dermacare_api_requests_total", "HTTP API requests, by route and status.",
+                route=self.request.path, status=str(self.get_status())).inc()
+
+
+class PredictHandler(_Handler):
+    async def post(self):
+        uploads = [(f.filename, f.body) for files in self.request.files.values() for f in files]
+        batch = bool(uploads)
+        if not batch:
+            uploads = [(None, self.request.body)]
+        if not all(data for _, data in uploads):
+            return self.fail(400, "Empty upload")
+        if len(uploads) > self.service.max_inflight:
+            return self.fail(413, f"At most {self.service.max_inflight} images per request")
+        if not self.service.ready:
+            return self.fail(503, "Model is not loaded", retry_after=5)
+        if not self.service.try_acquire(len(uploads)):
+            return self.fail(503, "Too many requests in flight", retry_after=1)
+
+        try:
+            results = await asyncio.gather(*(self.service.predict(data) for _, data in uploads),
+                                           return_exceptions=True)
+        finally:
+            self.service.release(len(uploads))
+
+        for result in results:
+            if not isinstance(result, (UploadRejected, Result)):
+                raise result
+        if not batch:
+            if isinstance(results[0], UploadRejected):
+                return self.fail(400, str(results[0]))
+            return self.finish(result_json(results[0]))
+        self.finish({"results": [
+            dict(filename=name, **({"error": str(result)} if isinstance(result, UploadRejected)
+                                   else result_json(result)))
+            for (name, _), result in zip(uploads, results)
+        ]})
+
+
+class HealthHandler(_Handler):
+    def get(self):
+        service = self.service
+        if not service.ready:
+            self.set_status(503)
+            self.write({"status": "error", "error": service.error} if service.error else {"status": "loading"})
+            return
+        self.write({"status": "ok", "model": model_version(service.model_path), "inflight": service.inflight,
+                    "max_inflight": service.max_inflight})
+
+
+class MetricsHandler(_Handler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(render_prometheus())
+
+
+def make_app(service):
+    return tornado.web.Application([
+        (r"/predict", PredictHandler, {"service": service}),
+        (r"/healthz", HealthHandler, {"service": service}),
+        (r"/metrics", MetricsHandler, {"service": service}),
+    ])
+
+
+async def serve(host, port, model_path):
+    service = InferenceService(model_path)
+    make_app(service).listen(port, host, max_body_size=config.API_MAX_BODY_BYTES)
+    logger.info("Serving %s on http://%s:%d", model_path, host, port)
+    await service.load()
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the skin disease classifier over HTTP.")
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(serve(args.host, args.port, args.model))
+
+
+if __name__ == "__main__":
+    main()
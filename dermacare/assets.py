@@ -0,0 +1,135 @@
+"""In-memory cache of the app's static images.
+
+``st.image("heartbeat.png", width=400)`` reads and re-encodes the file on
+every rerun.  Assets are instead read once, resized to their display width
+and kept as encoded bytes (or the original file, if it is no wider).
+Identical bytes give Streamlit's media cache and the browser a stable URL on
+every rerun.  Animated GIFs are kept as-is.
+
+Lottie animations are parsed once per file version in the same way.
+Thumbnails of arbitrary images, such as the reference cases of the embedding
+index, go to a bounded LRU instead, since there is no limit on how many of
+them a process shows.
+"""
+
+import functools
+import io
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class Asset:
+    name: str
+    data: bytes
+    size: tuple
+    source_bytes: int
+    load_seconds: float
+
+
+def _encode(path, width):
+    # Returns (bytes, size); the original file is kept only when it needs no resize.  A wider original is always
+    # replaced, even by larger bytes, since Streamlit would otherwise resize and re-encode it on every render.
+    with open(path, "rb") as f:
+        original = f.read()
+    with Image.open(io.BytesIO(original)) as img:
+        if getattr(img, "is_animated", False) or width is None or img.width <= width:
+            return original, img.size
+        height = max(1, round(img.height * width / img.width))
+        resized = img.resize((width, height), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    if resized.mode in ("RGBA", "LA", "P"):
+        resized.save(buffer, format="PNG", optimize=True)
+    else:
+        resized.convert("RGB").save(buffer, format="JPEG", quality=90, optimize=True)
+    return buffer.getvalue(), resized.size
+
+
+class AssetManager:
+    def __init__(self, directory="."):
+        self.directory = directory
+        self._assets = {}  # (name, width) -> Asset
+        self._lock = threading.Lock()
+
+    def get(self, name, width=None):
+        # Encoded image bytes for `name`, downscaled to `width` pixels if it is wider
+        asset = self._assets.get((name, width))
+        if asset is None:
+            with self._lock:
+                asset = self._assets.get((name, width))
+                if asset is None:
+                    asset = self._assets[name, width] = self._load(name, width)
+        return asset.data
+
+    def _load(self, name, width):
+        path = os.path.join(self.directory, name)
+        start = time.perf_counter()
+        data, size = _encode(path, width)
+        asset = Asset(name=name, data=data, size=size, source_bytes=os.path.getsize(path),
+                      load_seconds=time.perf_counter() - start)
+        logger.info("Loaded asset %s: %dx%d, %.1f KiB -> %.1f KiB in %.1f ms", name, size[0], size[1],
+                    asset.source_bytes / 1024, len(data) / 1024, asset.load_seconds * 1e3)
+        return asset
+
+    def preload(self, specs):
+        start = time.perf_counter()
+        for name, width in specs:
+            self.get(name, width)
+        assets = list(self._assets.values())
+        logger.info("Asset cache holds %d images: %.1f KiB (from %.1f KiB of files), preloaded in %.1f ms",
+                    len(assets), sum(len(a.data) for a in assets) / 1024,
+                    sum(a.source_bytes for a in assets) / 1024, (time.perf_counter() - start) * 1e3)
+
+    def stats(self):
+        return {f"{name}@{width or 'original'}": {"bytes": len(asset.data), "source_bytes": asset.source_bytes,
+                                                  "load_seconds": asset.load_seconds}
+                for (name, width), asset in self._assets.items()}
+
+
+_lock = threading.Lock()
+_manager = None
+
+
+def get_asset_manager():
+    global _manager
+    if _manager is None:
+        with _lock:
+            if _manager is None:
+                _manager = AssetManager()
+    return _manager
+
+
+def get_asset(name, width=None):
+    return get_asset_manager().get(name, width)
+
+
+@functools.lru_cache(maxsize=THUMBNAIL_CACHE_SIZE)
+def _thumbnail(path, mtime_ns, width):
+    return _encode(path, width)[0]
+
+
+def load_thumbnail(path, width):
+    # Encoded bytes of `path` downscaled to `width`, memoized by path and mtime in a bounded cache
+    return _thumbnail(os.path.abspath(path), os.stat(path).st_mtime_ns, width)
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_lottie(path, mtime_ns):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_lottie(path):
+    # Parsed Lottie JSON, memoized by path and mtime; callers must not mutate it
+    return _parse_lottie(os.path.abspath(path), os.stat(path).st_mtime_ns)
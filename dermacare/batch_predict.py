@@ -0,0 +1,152 @@
+"""Headless batch scoring of image folders or file lists.
+
+    python -m dermacare.batch_predict "train/Eczema Photos" -o scores.csv
+    python -m dermacare.batch_predict a.jpg b.png -o scores.jsonl
+
+Images are decoded and resized by a thread pool that runs ahead of
+inference, so decode and the forward passes overlap; each batch is then
+normalized into one reusable float32 buffer.  Each row holds the file name,
+the predicted class, its calibrated confidence, whether the prediction was
+below the abstain threshold, and the full probability vector.
+"""
+
+import argparse
+import collections
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from dermacare import config
+from dermacare.inference import get_engine
+from dermacare.ingest import decode_source, to_model_input
+from dermacare.labels import LabelManifestError, load_labels
+from dermacare.postprocess import load_temperature, postprocess
+from dermacare.preprocessing import Preprocessor
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def iter_image_paths(inputs):
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield item
+
+
+def load_image(path):
+    # The same decode scale and resize as the Prediction page, so scores match it for the same file
+    with open(path, "rb") as f:
+        return to_model_input(decode_source(f.read()))
+
+
+def decode_ahead(paths, workers, prefetch):
+    # Yield (path, resized image or exception) in input order, keeping at most `prefetch` decodes in flight
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dermacare-decode") as executor:
+        for path in paths:
+            pending.append((path, executor.submit(load_image, path)))
+            if len(pending) >= prefetch:
+                yield _resolve(*pending.popleft())
+        while pending:
+            yield _resolve(*pending.popleft())
+
+
+def _resolve(path, future):
+    try:
+        return path, future.result()
+    except (OSError, ValueError, cv2.error) as exc:
+        return path, exc
+
+
+class CsvWriter:
+    def __init__(self, f, class_names):
+        self._writer = csv.writer(f)
+        self._writer.writerow(["filename", "predicted_class", "confidence", "abstained"] + list(class_names))
+
+    def write(self, filename, result, probabilities):
+        self._writer.writerow([filename, result.predicted_class, f"{result.confidence:.6f}", int(result.abstained)]
+                              + [f"{p:.6f}" for p in probabilities])
+
+
+class JsonlWriter:
+    def __init__(self, f, class_names):
+        self._f = f
+        self._class_names = class_names
+
+    def write(self, filename, result, probabilities):
+        row = {
+            "filename": filename,
+            "predicted_class": result.predicted_class,
+            "confidence": result.confidence,
+            "abstained": result.abstained,
+            "top_k": [{"class": name, "probability": p} for name, p in zip(result.classes, result.probabilities)],
+            "probabilities": dict(zip(self._class_names, map(float, probabilities))),
+        }
+        self._f.write(json.dumps(row) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score image folders or files with the skin disease model.")
+    parser.add_argument("inputs", nargs="+", help="image files and/or directories (searched recursively)")
+    parser.add_argument("-o", "--output", required=True, help="output file; .jsonl for JSON lines, CSV otherwise")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--top-k", type=int, default=config.TOP_K)
+    parser.add_argument("--threshold", type=float, default=config.ABSTAIN_THRESHOLD,
+                        help="calibrated confidence below which a prediction is flagged as abstained")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="decode threads")
+    args = parser.parse_args(argv)
+
+    engine = get_engine(args.model)
+    preprocessor = Preprocessor(args.batch_size)
+    try:
+        class_names = load_labels(args.model, engine.num_classes)
+    except LabelManifestError as exc:
+        parser.error(str(exc))
+    temperature = load_temperature(args.model)
+
+    scored = failed = 0
+    start = time.perf_counter()
+    with open(args.output, "w", newline="") as f:
+        writer = (JsonlWriter if args.output.endswith(".jsonl") else CsvWriter)(f, class_names)
+
+        def flush(paths, images):
+            probabilities = engine.predict(preprocessor(images))
+            results = postprocess(probabilities, class_names, args.top_k, temperature, args.threshold)
+            for path, result, row in zip(paths, results, probabilities):
+                writer.write(path, result, row)
+
+        paths, images = [], []
+        for path, result in decode_ahead(iter_image_paths(args.inputs), args.workers, prefetch=2 * args.batch_size):
+            if isinstance(result, Exception):
+                print(f"skipping {path}: {result}", file=sys.stderr)
+                failed += 1
+                continue
+            paths.append(path)
+            images.append(result)
+            if len(images) == args.batch_size:
+                flush(paths, images)
+                scored += len(images)
+                paths, images = [], []
+        if images:
+            flush(paths, images)
+            scored += len(images)
+
+    elapsed = time.perf_counter() - start
+    print(f"scored {scored} images ({failed} skipped) in {elapsed:.2f}s "
+          f"({scored / elapsed if elapsed else 0.0:.1f} images/sec) -> {args.output}", file=sys.stderr)
+    return 0 if scored or not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
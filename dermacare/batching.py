@@ -0,0 +1,155 @@
+"""Cross-session micro-batching of model inference.
+
+Every Streamlit session submits its decoded image to one background worker
+per model.  The worker waits for up to ``max_wait_ms`` or ``max_batch_size``
+items, preprocesses them into a preallocated batch buffer, runs a single
+forward pass and resolves each caller's future, so concurrent uploads share one
+TensorFlow call instead of contending for its thread pools.  With
+``DERMACARE_WORKERS`` set, batches are dispatched to the worker processes of
+``dermacare.worker_pool`` instead, without waiting for one to finish before
+collecting the next.
+"""
+
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from dermacare import config
+from dermacare.inference import get_embedding_engine, get_engine
+from dermacare.metrics import Histogram, register_histogram, timer
+from dermacare.preprocessing import Preprocessor
+from dermacare.worker_pool import get_pool
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=config.BATCH_MAX_SIZE, max_wait_ms=config.BATCH_MAX_WAIT_MS,
+                 preprocess=True, dispatch=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        # Without preprocessing, submitted items must already be (64, 64, 3) float32 tensors.
+        # `dispatch` replaces preprocessing and predict_fn: it takes the raw images and returns a Future.
+        self._preprocessor = Preprocessor(max_batch_size) if preprocess and dispatch is None else None
+        self._dispatch = dispatch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.batch_latency = Histogram()
+        self._predict_fn = predict_fn
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="dermacare-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image):
+        # image: one decoded BGR uint8 image; resolves to its probability vector
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def predict(self, image):
+        return self.submit(image).result()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        return {"batch_size": self.batch_sizes.snapshot(), "batch_latency_seconds": self.batch_latency.snapshot()}
+
+    def _collect(self):
+        item = self._queue.get()
+        if item is _STOP:
+            return None
+        items = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            items.append(item)
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+            items = [(image, future) for image, future in items if future.set_running_or_notify_cancel()]
+            if not items:
+                continue
+
+            start = time.perf_counter()
+            try:
+                images = [image for image, _ in items]
+                if self._dispatch is not None:
+                    self._dispatch(images).add_done_callback(functools.partial(self._dispatched, items, start))
+                    continue
+                with timer("preprocess"):
+                    batch = self._preprocessor(images) if self._preprocessor is not None else np.stack(images)
+                with timer("inference"):
+                    probabilities = self._predict_fn(batch)
+            except BaseException as exc:
+                for _, future in items:
+                    future.set_exception(exc)
+                continue
+            self._resolve(items, start, probabilities)
+
+    def _dispatched(self, items, start, done):
+        if done.exception() is not None:
+            for _, future in items:
+                future.set_exception(done.exception())
+            return
+        self._resolve(items, start, done.result())
+
+    def _resolve(self, items, start, probabilities):
+        self.batch_latency.observe(time.perf_counter() - start)
+        self.batch_sizes.observe(len(items))
+        for (_, future), probs in zip(items, probabilities):
+            future.set_result(probs)
+
+
+_lock = threading.Lock()
+_batchers = {}  # (abspath, output) -> batcher
+OUTPUTS = ("probabilities", "embeddings")
+
+
+def get_batcher(path=config.MODEL_PATH, output="probabilities"):
+    # output="embeddings" batches penultimate-layer features (see EmbeddingEngine) instead of class probabilities
+    if output not in OUTPUTS:
+        raise ValueError(f"output must be one of {OUTPUTS}, not {output!r}")
+    key = os.path.abspath(path), output
+    batcher = _batchers.get(key)
+    if batcher is None:
+        with _lock:
+            batcher = _batchers.get(key)
+            if batcher is None:
+                path = key[0]
+                if config.WORKERS:
+                    batcher = MicroBatcher(None, dispatch=functools.partial(get_pool(path).submit, output=output))
+                elif output == "embeddings":
+                    get_embedding_engine(path)
+                    batcher = MicroBatcher(lambda batch: get_embedding_engine(path).embed(batch))
+                else:
+                    get_engine(path)
+                    # Resolve the engine per batch so a reloaded model is picked up automatically
+                    batcher = MicroBatcher(lambda batch: get_engine(path).predict(batch))
+                _batchers[key] = batcher
+                labels = {"model": os.path.basename(path), "output": output}
+                register_histogram("dermacare_batch_size", "Images per inference batch.", batcher.batch_sizes,
+                                   **labels)
+                register_histogram("dermacare_batch_latency_seconds", "Preprocessing plus forward pass time per batch.",
+                                   batcher.batch_latency, **labels)
+    return batcher
@@ -0,0 +1,107 @@
+"""Fit the softmax temperature used by ``dermacare.postprocess``.
+
+    python -m dermacare.calibrate train
+
+Runs the model over a labelled class-folder tree, finds the temperature that
+minimizes the negative log-likelihood of the true classes, and writes it to
+``<model>.calibration.json``.  Images in folders that are not a class in the
+label manifest are ignored.
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+from dermacare import config
+from dermacare.batch_predict import decode_ahead, iter_image_paths
+from dermacare.inference import get_engine
+from dermacare.labels import load_labels
+from dermacare.postprocess import apply_temperature, calibration_path
+from dermacare.preprocessing import Preprocessor
+
+
+def negative_log_likelihood(probabilities, labels, temperature):
+    calibrated = apply_temperature(probabilities, temperature)
+    return float(-np.mean(np.log(np.clip(calibrated[np.arange(len(labels)), labels], 1e-7, 1.0))))
+
+
+def fit_temperature(probabilities, labels, low=0.05, high=20.0, iterations=60):
+    # Golden-section search over log(T); the NLL is unimodal in T
+    a, b = math.log(low), math.log(high)
+    ratio = (math.sqrt(5) - 1) / 2
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    fc = negative_log_likelihood(probabilities, labels, math.exp(c))
+    fd = negative_log_likelihood(probabilities, labels, math.exp(d))
+    for _ in range(iterations):
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - ratio * (b - a)
+            fc = negative_log_likelihood(probabilities, labels, math.exp(c))
+        else:
+            a, c, fc = c, d, fd
+            d = a + ratio * (b - a)
+            fd = negative_log_likelihood(probabilities, labels, math.exp(d))
+    return math.exp((a + b) / 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit the confidence temperature on a labelled class-folder tree.")
+    parser.add_argument("data_dir", nargs="?", default="train")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args(argv)
+
+    engine = get_engine(args.model)
+    class_names = load_labels(args.model, engine.num_classes)
+    class_index = {name: i for i, name in enumerate(class_names)}
+    paths = [path for path in iter_image_paths([args.data_dir])
+             if os.path.basename(os.path.dirname(path)) in class_index]
+    if not paths:
+        parser.error(f"no images under {args.data_dir} belong to a class in the label manifest")
+
+    preprocessor = Preprocessor(args.batch_size)
+    labels, probabilities, images = [], [], []
+    for path, result in decode_ahead(paths, args.workers, prefetch=2 * args.batch_size):
+        if isinstance(result, Exception):
+            print(f"skipping {path}: {result}", file=sys.stderr)
+            continue
+        labels.append(class_index[os.path.basename(os.path.dirname(path))])
+        images.append(result)
+        if len(images) == args.batch_size:
+            probabilities.append(engine.predict(preprocessor(images)))
+            images = []
+    if images:
+        probabilities.append(engine.predict(preprocessor(images)))
+    probabilities, labels = np.concatenate(probabilities), np.array(labels)
+
+    if len(set(labels)) < 2:
+        print("warning: only one class is represented; the fitted temperature will mostly reward "
+              "over-confidence", file=sys.stderr)
+
+    temperature = fit_temperature(probabilities, labels)
+    calibration = {
+        "version": 1,
+        "model": os.path.basename(args.model),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "temperature": temperature,
+        "samples": len(labels),
+        "nll_before": negative_log_likelihood(probabilities, labels, 1.0),
+        "nll_after": negative_log_likelihood(probabilities, labels, temperature),
+    }
+    path = calibration_path(args.model)
+    with open(path, "w") as f:
+        json.dump(calibration, f, indent=2)
+        f.write("\n")
+    print(f"temperature {temperature:.3f} on {len(labels)} images "
+          f"(NLL {calibration['nll_before']:.4f} -> {calibration['nll_after']:.4f}) -> {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Runtime settings, overridable through ``DERMACARE_*`` environment variables."""
+
+import os
+
+# Model; the backend follows the file type (.h5/.keras -> Keras, .tflite -> TFLite interpreter)
+MODEL_PATH = os.environ.get("DERMACARE_MODEL_PATH", "skin_disease_classification_model.h5")
+IMAGE_SIZE = 64
+TFLITE_THREADS = int(os.environ.get("DERMACARE_TFLITE_THREADS", str(os.cpu_count() or 1)))
+
+# Cross-session micro-batching
+BATCH_MAX_SIZE = int(os.environ.get("DERMACARE_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("DERMACARE_BATCH_MAX_WAIT_MS", "5"))
+
+# Prediction cache; the on-disk tier is enabled by giving it a SQLite path
+CACHE_MAX_ENTRIES = int(os.environ.get("DERMACARE_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = float(os.environ.get("DERMACARE_CACHE_TTL_SECONDS", "86400"))
+CACHE_DISK_PATH = os.environ.get("DERMACARE_CACHE_DISK_PATH", "")
+
+# Upload ingestion limits, checked before the image is decoded
+UPLOAD_MAX_BYTES = int(os.environ.get("DERMACARE_UPLOAD_MAX_BYTES", str(25 * 2 ** 20)))
+UPLOAD_MAX_PIXELS = int(os.environ.get("DERMACARE_UPLOAD_MAX_PIXELS", str(50_000_000)))
+DISPLAY_WIDTH = 200
+
+# Channel order the model was trained on; cv2 decodes to BGR
+CHANNEL_ORDER = os.environ.get("DERMACARE_CHANNEL_ORDER", "BGR").upper()
+
+# Load the ML stack in a background thread after the first page renders
+PREWARM = os.environ.get("DERMACARE_PREWARM", "1") != "0"
+
+# Recommendation content, one JSON file per class
+CONTENT_DIR = os.environ.get("DERMACARE_CONTENT_DIR", "content")
+# How often lookups check the directory for edited or added files
+CONTENT_RECHECK_SECONDS = float(os.environ.get("DERMACARE_CONTENT_RECHECK_SECONDS", "2"))
+
+# Post-processing: how many classes to report, and the calibrated confidence below which we abstain
+TOP_K = int(os.environ.get("DERMACARE_TOP_K", "3"))
+ABSTAIN_THRESHOLD = float(os.environ.get("DERMACARE_ABSTAIN_THRESHOLD", "0.5"))
+
+# Prometheus-style /metrics endpoint (port 0 disables it) and 1-in-N request profiling (0 disables it)
+METRICS_HOST = os.environ.get("DERMACARE_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("DERMACARE_METRICS_PORT", "9464"))
+PROFILE_EVERY = int(os.environ.get("DERMACARE_PROFILE_EVERY", "0"))
+PROFILE_DIR = os.environ.get("DERMACARE_PROFILE_DIR", "profiles")
+
+# Standalone HTTP API (python -m dermacare.api); beyond API_MAX_INFLIGHT images in progress, requests get 503
+API_HOST = os.environ.get("DERMACARE_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("DERMACARE_API_PORT", "8000"))
+API_MAX_INFLIGHT = int(os.environ.get("DERMACARE_API_MAX_INFLIGHT", "64"))
+API_DECODE_WORKERS = int(os.environ.get("DERMACARE_API_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+API_MAX_BODY_BYTES = int(os.environ.get("DERMACARE_API_MAX_BODY_BYTES", str(64 * 2 ** 20)))
+
+# Inference worker processes (0 runs the model in the server process); each gets its own model copy, a TensorFlow
+# thread budget and WORKER_SLOTS shared-memory batch slots
+WORKERS = int(os.environ.get("DERMACARE_WORKERS", "0"))
+WORKER_INTRA_OP_THREADS = int(os.environ.get("DERMACARE_WORKER_INTRA_OP_THREADS",
+                                             str(max(1, (os.cpu_count() or 1) // max(WORKERS, 1)))))
+WORKER_INTER_OP_THREADS = int(os.environ.get("DERMACARE_WORKER_INTER_OP_THREADS", "1"))
+WORKER_SLOTS = int(os.environ.get("DERMACARE_WORKER_SLOTS", "2"))
+
+# Test-time augmentation: "off", "uncertain" (re-predict only results below ABSTAIN_THRESHOLD) or "always"
+TTA = os.environ.get("DERMACARE_TTA", "off").lower()
+
+# Embedding index of reference images (built with python -m dermacare.embedding_index); SIMILAR_CASES=0 hides them
+INDEX_DIR = os.environ.get("DERMACARE_INDEX_DIR", os.path.join(".cache", "index"))
+INDEX_NPROBE = int(os.environ.get("DERMACARE_INDEX_NPROBE", "8"))
+SIMILAR_CASES = int(os.environ.get("DERMACARE_SIMILAR_CASES", "3"))
@@ -0,0 +1,125 @@
+"""Export the Keras model to TFLite and compare it against the original.
+
+    python -m dermacare.export_tflite --quantize dynamic
+    python -m dermacare.export_tflite --quantize int8 --calibration-dir train
+
+``dynamic`` quantizes weights to int8; ``int8`` also quantizes activations,
+calibrated on images sampled from the calibration directory.  Input and
+output stay float32 so the exported model is a drop-in for the Keras one:
+point ``DERMACARE_MODEL_PATH`` at the ``.tflite`` file to serve it.
+
+After export, both models are run over the evaluation images and the report
+lists file size, load memory, latency and the accuracy delta.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from dermacare import config
+from dermacare.batch_predict import iter_image_paths, load_image
+from dermacare.inference import InferenceEngine, TFLiteEngine
+from dermacare.labels import load_labels, write_manifest
+from dermacare.memory import current_rss
+from dermacare.model_registry import load_keras_model, load_tflite_model
+from dermacare.preprocessing import Preprocessor, preprocess
+
+
+def sample_images(directory, limit, seed=0):
+    paths = list(iter_image_paths([directory]))
+    random.Random(seed).shuffle(paths)
+    return paths[:limit]
+
+
+def convert(model, quantize, calibration_paths):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "int8":
+        def representative_dataset():
+            for path in calibration_paths:
+                yield [preprocess(load_image(path))[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def evaluate(name, path, engine_cls, loader, images, labels, reference=None, runs=100):
+    rss_before = current_rss()
+    engine = engine_cls(loader(path))
+    load_bytes = current_rss() - rss_before
+
+    probabilities = np.concatenate([engine.predict(Preprocessor(len(chunk))(chunk))
+                                    for chunk in (images[i:i + 32] for i in range(0, len(images), 32))])
+    single = preprocess(images[0])
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        engine.predict(single)
+        timings.append(time.perf_counter() - start)
+
+    predicted = probabilities.argmax(axis=1)
+    row = {
+        "backend": name,
+        "file MB": os.path.getsize(path) / 2 ** 20,
+        "load RSS MB": load_bytes / 2 ** 20,
+        "p50 ms": statistics.median(timings) * 1e3,
+        "accuracy": float(np.mean(predicted == labels)),
+    }
+    if reference is not None:
+        row["top-1 agree"] = float(np.mean(predicted == reference.argmax(axis=1)))
+        row["max |dp|"] = float(np.abs(probabilities - reference).max())
+    return row, probabilities
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the model to TFLite and report the accuracy/latency trade-off.")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--output", help="defaults to the model path with a .tflite (or _int8.tflite, ...) suffix")
+    parser.add_argument("--quantize", choices=("none", "dynamic", "int8"), default="dynamic")
+    parser.add_argument("--calibration-dir", default="train")
+    parser.add_argument("--calibration-size", type=int, default=200)
+    parser.add_argument("--eval-dir", default="train")
+    parser.add_argument("--eval-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    stem = os.path.splitext(args.model)[0]
+    output = args.output or stem + ("" if args.quantize == "none" else f"_{args.quantize}") + ".tflite"
+
+    keras_model = load_keras_model(args.model)
+    class_names = load_labels(args.model, keras_model.output_shape[-1])
+    with open(output, "wb") as f:
+        f.write(convert(keras_model, args.quantize, sample_images(args.calibration_dir, args.calibration_size)))
+    write_manifest(output, class_names)
+    print(f"wrote {output} ({os.path.getsize(output) / 2 ** 20:.2f} MB, quantize={args.quantize})", file=sys.stderr)
+
+    eval_paths = sample_images(args.eval_dir, args.eval_size)
+    images = [load_image(path) for path in eval_paths]
+    # Ground truth is the class folder each image sits in (-1 for folders that are not a known class)
+    folders = [os.path.basename(os.path.dirname(path)) for path in eval_paths]
+    labels = np.array([class_names.index(f) if f in class_names else -1 for f in folders])
+
+    keras_row, reference = evaluate("keras", args.model, InferenceEngine, load_keras_model, images, labels)
+    tflite_row, _ = evaluate(f"tflite/{args.quantize}", output, TFLiteEngine, load_tflite_model, images, labels,
+                             reference=reference)
+
+    columns = ["backend", "file MB", "load RSS MB", "p50 ms", "accuracy", "top-1 agree", "max |dp|"]
+    print(f"evaluated on {len(images)} images from {args.eval_dir}")
+    print("".join(f"{c:>14}" for c in columns))
+    for row in (keras_row, tflite_row):
+        print("".join(f"{row[c]:>14}" if isinstance(row.get(c), str) else f"{row.get(c, float('nan')):>14.3f}"
+                      for c in columns))
+    print(f"accuracy delta: {tflite_row['accuracy'] - keras_row['accuracy']:+.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
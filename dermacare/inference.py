@@ -0,0 +1,124 @@
+"""Low-overhead inference over the loaded model.
+
+``model.predict`` builds a tf.data pipeline and callback list on every call,
+which dominates the cost for single images.  The Keras engine instead calls
+the model through a ``tf.function`` traced once for a fixed input signature.
+The TFLite engine drives an interpreter behind the same ``predict`` interface,
+and the embedding engine returns the Keras model's penultimate features.
+"""
+
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+from dermacare import config
+from dermacare.model_registry import get_model, is_tflite
+
+
+class InferenceEngine:
+    def __init__(self, model):
+        self.model = model
+        size = config.IMAGE_SIZE
+        self._forward = tf.function(
+            self._call, input_signature=[tf.TensorSpec((None, size, size, 3), tf.float32)])
+        # Trace up front so the first request does not pay for graph construction
+        self._forward(tf.zeros((1, size, size, 3), tf.float32))
+
+    @property
+    def num_classes(self):
+        return self.model.output_shape[-1]
+
+    def _call(self, x):
+        return self.model(x, training=False)
+
+    def predict(self, batch):
+        # batch: (N, 64, 64, 3) or a single (64, 64, 3) image, already normalized
+        batch = np.asarray(batch, dtype=np.float32)
+        if batch.ndim == 3:
+            batch = batch[np.newaxis]
+        return self._forward(batch).numpy()
+
+
+class TFLiteEngine:
+    def __init__(self, interpreter):
+        self.model = interpreter
+        self._input = interpreter.get_input_details()[0]["index"]
+        self._output = interpreter.get_output_details()[0]["index"]
+        self._batch_size = interpreter.get_input_details()[0]["shape"][0]
+        # Interpreters are not thread-safe
+        self._lock = threading.Lock()
+
+    @property
+    def num_classes(self):
+        return int(self.model.get_output_details()[0]["shape"][-1])
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if batch.ndim == 3:
+            batch = batch[np.newaxis]
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.model.resize_tensor_input(self._input, batch.shape)
+                self.model.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.model.set_tensor(self._input, batch)
+            self.model.invoke()
+            return self.model.get_tensor(self._output).copy()
+
+
+class EmbeddingEngine:
+    # Penultimate-layer features (the classifier head's input), L2-normalized for cosine similarity
+    def __init__(self, model):
+        if not hasattr(model, "layers"):
+            raise ValueError("embeddings need a Keras model; TFLite models do not expose intermediate layers")
+        self.model = model
+        self._features = tf.keras.Model(model.inputs, model.layers[-1].input)
+        size = config.IMAGE_SIZE
+        self._forward = tf.function(
+            self._call, input_signature=[tf.TensorSpec((None, size, size, 3), tf.float32)])
+        self._forward(tf.zeros((1, size, size, 3), tf.float32))
+
+    @property
+    def dim(self):
+        return int(self._features.output_shape[-1])
+
+    def _call(self, x):
+        return tf.math.l2_normalize(self._features(x, training=False), axis=-1)
+
+    def embed(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        if batch.ndim == 3:
+            batch = batch[np.newaxis]
+        return self._forward(batch).numpy()
+
+
+_lock = threading.Lock()
+_engines = {}  # abspath -> engine wrapping the registry's current model
+_embedding_engines = {}
+
+
+def get_engine(path=config.MODEL_PATH):
+    path = os.path.abspath(path)
+    model = get_model(path)
+    engine = _engines.get(path)
+    if engine is None or engine.model is not model:
+        with _lock:
+            engine = _engines.get(path)
+            if engine is None or engine.model is not model:
+                engine_cls = TFLiteEngine if is_tflite(path) else InferenceEngine
+                engine = _engines[path] = engine_cls(model)
+    return engine
+
+
+def get_embedding_engine(path=config.MODEL_PATH):
+    path = os.path.abspath(path)
+    model = get_model(path)
+    engine = _embedding_engines.get(path)
+    if engine is None or engine.model is not model:
+        with _lock:
+            engine = _embedding_engines.get(path)
+            if engine is None or engine.model is not model:
+                engine = _embedding_engines[path] = EmbeddingEngine(model)
+    return engine
@@ -0,0 +1,81 @@
+"""Upload ingestion with downscale-on-decode.
+
+Phone photos are often 12+ MP but are shown at 200px and fed to the model at
+64x64.  The header is probed with Pillow (no pixel data is read), oversized
+payloads are rejected, and JPEGs are decoded directly at 1/2, 1/4 or 1/8
+scale via libjpeg's DCT scaling, which cuts decode time and peak memory by
+roughly the square of the factor.
+"""
+
+import io
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from dermacare import config
+
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+# Shorter side uploads are decoded to by default: enough for the preview and the test-time augmentation crops
+SOURCE_MIN_SIDE = max(config.DISPLAY_WIDTH, config.IMAGE_SIZE)
+
+
+class UploadRejected(ValueError):
+    pass
+
+
+@dataclass
+class Upload:
+    display: np.ndarray  # RGB uint8, DISPLAY_WIDTH wide
+    model_input: np.ndarray  # BGR uint8, IMAGE_SIZE x IMAGE_SIZE
+    source: np.ndarray  # BGR uint8 as decoded (shorter side >= DISPLAY_WIDTH), for test-time augmentation crops
+
+
+def probe_size(data):
+    # (width, height) from the image header, without decoding pixels
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.size
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise UploadRejected(f"Unsupported or corrupt image: {exc}") from exc
+
+
+def decode(data, min_side, max_bytes=config.UPLOAD_MAX_BYTES, max_pixels=config.UPLOAD_MAX_PIXELS):
+    # Decode to BGR at the smallest scale whose shorter side is still at least `min_side`
+    if len(data) > max_bytes:
+        raise UploadRejected(f"Image is {len(data) / 2 ** 20:.1f} MB; the limit is {max_bytes / 2 ** 20:.1f} MB")
+    width, height = probe_size(data)
+    if width * height > max_pixels:
+        raise UploadRejected(f"Image is {width}x{height}; the limit is {max_pixels / 1e6:.0f} megapixels")
+
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced_flag in _REDUCED_FLAGS:
+        if min(width, height) // factor >= min_side:
+            flag = reduced_flag
+            break
+
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if image is None:
+        raise UploadRejected("Unsupported or corrupt image")
+    return image
+
+
+def decode_source(data):
+    # Decode at the scale the Prediction page uses, so every entry point derives the same model input from the bytes
+    return decode(data, min_side=SOURCE_MIN_SIDE)
+
+
+def to_model_input(image):
+    return cv2.resize(image, (config.IMAGE_SIZE, config.IMAGE_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def ingest(data, display_width=config.DISPLAY_WIDTH):
+    image = decode_source(data) if display_width <= SOURCE_MIN_SIDE else decode(data, min_side=display_width)
+    height, width = image.shape[:2]
+    display_height = max(1, round(height * display_width / width))
+    display = cv2.resize(image, (display_width, display_height), interpolation=cv2.INTER_AREA)
+    cv2.cvtColor(display, cv2.COLOR_BGR2RGB, dst=display)
+    return Upload(display=display, model_input=to_model_input(image), source=image)
@@ -0,0 +1,101 @@
+"""Versioned class-label manifests stored next to the model file.
+
+``skin_disease_classification_model.h5`` is paired with
+``skin_disease_classification_model.labels.json``, which lists the class
+names in model output order.  The manifest is written when a model is
+trained or exported, so serving never has to list the training image tree.
+
+    python -m dermacare.labels train --model skin_disease_classification_model.h5
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import threading
+
+from dermacare import config
+
+MANIFEST_VERSION = 1
+
+_lock = threading.Lock()
+_manifests = {}  # abspath -> ((mtime_ns, size), classes)
+
+
+class LabelManifestError(ValueError):
+    pass
+
+
+def manifest_path(model_path):
+    return os.path.splitext(model_path)[0] + ".labels.json"
+
+
+def write_manifest(model_path, class_names):
+    path = manifest_path(model_path)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "model": os.path.basename(model_path),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "classes": list(class_names),
+    }
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    return path
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError as exc:
+        raise LabelManifestError(f"No label manifest at {path}; generate it with "
+                                 f"`python -m dermacare.labels`") from exc
+    except json.JSONDecodeError as exc:
+        raise LabelManifestError(f"{path} is not valid JSON: {exc}") from exc
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise LabelManifestError(f"{path} has manifest version {manifest.get('version')!r}; "
+                                 f"expected {MANIFEST_VERSION}")
+    classes = manifest.get("classes")
+    if not isinstance(classes, list) or not classes or not all(isinstance(c, str) for c in classes):
+        raise LabelManifestError(f"{path} must list the class names under 'classes'")
+    if len(set(classes)) != len(classes):
+        raise LabelManifestError(f"{path} contains duplicate class names")
+    return tuple(classes)
+
+
+def load_labels(model_path=config.MODEL_PATH, num_classes=None):
+    # Class names in model output order, read once per manifest change and checked against the model width
+    path = os.path.abspath(manifest_path(model_path))
+    try:
+        st = os.stat(path)
+        key = st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        key = None
+    entry = _manifests.get(path)
+    if entry is None or entry[0] != key:
+        with _lock:
+            entry = _manifests[path] = (key, _read(path))
+    classes = entry[1]
+    if num_classes is not None and len(classes) != num_classes:
+        raise LabelManifestError(f"{path} lists {len(classes)} classes but the model outputs {num_classes}")
+    return classes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the label manifest for a model trained on a class-folder tree.")
+    parser.add_argument("train_dir", help="directory with one sub-folder per class")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    class_names = sorted(entry.name for entry in os.scandir(args.train_dir) if entry.is_dir())
+    if not class_names:
+        parser.error(f"{args.train_dir} has no class folders")
+    print(write_manifest(args.model, class_names))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
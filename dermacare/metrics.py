@@ -0,0 +1,243 @@
+"""Lightweight in-process metrics.
+
+Histograms and counters are cheap enough to update on every request (a lock
+and a few integer additions).  ``render_prometheus`` formats them, plus the
+values reported by registered collectors, in the Prometheus text exposition
+format, and ``start_metrics_server`` serves that on ``/metrics`` from a
+daemon thread.  ``maybe_profile`` runs cProfile (or pyinstrument, when
+installed) on one request in every ``DERMACARE_PROFILE_EVERY``.
+"""
+
+import bisect
+import contextlib
+import itertools
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dermacare import config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    # Cumulative-free bucket counts; the last slot counts observations above the largest bound
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "buckets": dict(zip(self.buckets + (float("inf"),), self._counts)),
+                "sum": self._sum,
+                "count": self._count,
+            }
+
+
+class Counter:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+
+_lock = threading.Lock()
+_families = {}  # name -> (type, help, {sorted label items: Histogram | Counter})
+_collectors = []
+
+
+def _series(name, kind, help_text, labels, factory):
+    family = _families.get(name)
+    if family is None:
+        with _lock:
+            family = _families.setdefault(name, (kind, help_text, {}))
+    key = tuple(sorted(labels.items()))
+    metric = family[2].get(key)
+    if metric is None:
+        with _lock:
+            metric = family[2].setdefault(key, factory())
+    return metric
+
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS, **labels):
+    return _series(name, "histogram", help_text, labels, lambda: Histogram(buckets))
+
+
+def register_histogram(name, help_text, metric, **labels):
+    # Export a histogram that is owned elsewhere (e.g. by a batcher)
+    return _series(name, "histogram", help_text, labels, lambda: metric)
+
+
+def counter(name, help_text, **labels):
+    return _series(name, "counter", help_text, labels, Counter)
+
+
+def register_collector(collect):
+    # `collect()` returns (name, type, help, labels, value) tuples, read at scrape time
+    with _lock:
+        _collectors.append(collect)
+
+
+def observe_stage(stage, seconds):
+    histogram("dermacare_stage_seconds", "Time spent in each stage of the prediction path.",
+              stage=stage).observe(seconds)
+
+
+@contextlib.contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def _process_metrics():
+    # Imported on first scrape: main.py imports this module on every page, including those that never scrape
+    from dermacare.memory import current_rss
+
+    yield "dermacare_process_resident_memory_bytes", "gauge", "Resident set size.", {}, current_rss()
+
+
+register_collector(_process_metrics)
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        families = [(name, kind, help_text, list(series.items())) for name, (kind, help_text, series)
+                    in sorted(_families.items())]
+        collectors = list(_collectors)
+
+    for name, kind, help_text, series in families:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, metric in series:
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+                continue
+            snapshot = metric.snapshot()
+            cumulative = 0
+            for bound, count in snapshot["buckets"].items():
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_bound(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+    declared = set()
+    for collect in collectors:
+        try:
+            samples = list(collect())
+        except Exception:
+            logger.warning("Metrics collector %r failed", collect, exc_info=True)
+            continue
+        for name, kind, help_text, labels, value in samples:
+            if name not in declared:
+                declared.add(name)
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines.append(f"{name}{_format_labels(sorted(labels.items()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port=config.METRICS_PORT, host=config.METRICS_HOST):
+    # Idempotent; returns None if the port is taken (e.g. by another app process)
+    global _server
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as exc:
+                logger.warning("Metrics endpoint not started on %s:%d: %s", host, port, exc)
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="dermacare-metrics", daemon=True).start()
+            logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return _server
+
+
+_requests = itertools.count(1)
+
+
+@contextlib.contextmanager
+def maybe_profile(name):
+    # Profile one call in every PROFILE_EVERY; output goes to PROFILE_DIR
+    every = config.PROFILE_EVERY
+    if every <= 0 or next(_requests) % every:
+        yield
+        return
+
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(config.PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(stem + ".prof")
+    else:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(stem + ".html", "w") as f:
+                f.write(profiler.output_html())
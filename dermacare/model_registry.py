@@ -0,0 +1,122 @@
+"""Process-wide registry of loaded models.
+
+Streamlit re-executes ``main.py`` on every widget interaction, but imported
+modules stay in ``sys.modules``; keeping the models here means each one is
+deserialized once per process and shared by every session.  Entries are keyed
+by path and reloaded only when the file's mtime or size changes.
+
+``.tflite`` files are loaded as TFLite interpreters, anything else as a Keras
+model.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from dermacare import config
+from dermacare.memory import current_rss
+from dermacare.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_models = {}  # abspath -> (file key, model)
+_stats = {}  # abspath -> load metrics of the current entry
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def is_tflite(path):
+    return path.endswith(".tflite")
+
+
+def load_keras_model(path):
+    return keras.models.load_model(path, compile=False)
+
+
+def _warm_up_keras(model, dummy):
+    model(dummy, training=False)
+
+
+def load_tflite_model(path):
+    interpreter = tf.lite.Interpreter(model_path=path, num_threads=config.TFLITE_THREADS)
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+def _warm_up_tflite(interpreter, dummy):
+    interpreter.set_tensor(interpreter.get_input_details()[0]["index"], dummy)
+    interpreter.invoke()
+
+
+def get_model(path=config.MODEL_PATH):
+    path = os.path.abspath(path)
+    key = _file_key(path)
+    entry = _models.get(path)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+
+    with _lock:
+        # Another session may have finished loading while we waited
+        entry = _models.get(path)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        if is_tflite(path):
+            load, warm_up = load_tflite_model, _warm_up_tflite
+        else:
+            load, warm_up = load_keras_model, _warm_up_keras
+        rss_before = current_rss()
+        start = time.perf_counter()
+        model = load(path)
+        load_seconds = time.perf_counter() - start
+
+        # Warm up with one dummy forward pass so the first real request does not pay for it
+        start = time.perf_counter()
+        warm_up(model, np.zeros((1, config.IMAGE_SIZE, config.IMAGE_SIZE, 3), np.float32))
+        warmup_seconds = time.perf_counter() - start
+
+        _models[path] = (key, model)
+        _stats[path] = {
+            "mtime_ns": key[0],
+            "size_bytes": key[1],
+            "load_seconds": load_seconds,
+            "warmup_seconds": warmup_seconds,
+            "rss_delta_bytes": current_rss() - rss_before,
+            "loaded_at": time.time(),
+        }
+        logger.info("Loaded %s in %.2fs (warm-up %.2fs, +%.1f MiB RSS)", path, load_seconds,
+                    warmup_seconds, _stats[path]["rss_delta_bytes"] / 2 ** 20)
+        return model
+
+
+def model_version(path=config.MODEL_PATH):
+    # Changes whenever the model file is replaced; used to key cached predictions
+    mtime_ns, size = _file_key(os.path.abspath(path))
+    return f"{os.path.basename(path)}:{mtime_ns}:{size}"
+
+
+def model_stats():
+    # Load-time and memory metrics for every model currently held by the registry
+    return {path: dict(stats) for path, stats in _stats.items()}
+
+
+def _model_metrics():
+    for path, stats in model_stats().items():
+        labels = {"model": os.path.basename(path)}
+        yield "dermacare_model_load_seconds", "gauge", "Time to deserialize the model.", labels, stats["load_seconds"]
+        yield ("dermacare_model_warmup_seconds", "gauge", "Time of the warm-up forward pass.", labels,
+               stats["warmup_seconds"])
+        yield ("dermacare_model_load_rss_bytes", "gauge", "RSS growth caused by loading the model.", labels,
+               stats["rss_delta_bytes"])
+
+
+register_collector(_model_metrics)
@@ -0,0 +1,98 @@
+"""The Prediction page's inference path, usable outside Streamlit.
+
+``predict_disease`` is what ``main.py`` runs when Predict is clicked: a
+content-addressed cache lookup, then (on a miss) the cross-session batcher,
+then top-k post-processing.  Benchmarks and other front ends call it so they
+measure and serve exactly what the page does; the async API uses the
+``lookup``/``store``/``result`` steps around its own non-blocking wait.
+Uncertain results can be re-predicted with test-time augmentation
+(``dermacare.tta``), cached separately, and ``similar_cases`` looks the upload
+up in the embedding index of reference images.
+"""
+
+import contextlib
+
+from dermacare import config, tta
+from dermacare.batching import get_batcher
+from dermacare.embedding_index import get_index
+from dermacare.inference import get_engine
+from dermacare.labels import load_labels
+from dermacare.model_registry import model_version
+from dermacare.postprocess import load_temperature, postprocess
+from dermacare.prediction_cache import get_prediction_cache
+from dermacare.worker_pool import get_pool
+
+
+def class_names(model_path=config.MODEL_PATH):
+    # With worker processes the model is only loaded in the workers
+    num_classes = get_pool(model_path).num_classes if config.WORKERS else get_engine(model_path).num_classes
+    return load_labels(model_path, num_classes)
+
+
+def lookup(image_bytes, model_path=config.MODEL_PATH, variant=""):
+    # (cache key, cached probability vector or None) for a raw upload; `variant` separates e.g. TTA results
+    cache = get_prediction_cache()
+    key = cache.key(image_bytes, model_version(model_path) + variant)
+    return key, cache.get(key)
+
+
+def store(key, prediction):
+    get_prediction_cache().put(key, prediction)
+
+
+def result(prediction, model_path=config.MODEL_PATH):
+    # Top-k classes with calibrated confidence; abstains below the configured threshold
+    return postprocess(prediction, class_names(model_path), temperature=load_temperature(model_path))[0]
+
+
+def predict_disease(image, image_bytes, model_path=config.MODEL_PATH, wait=contextlib.nullcontext, source=None,
+                    tta_mode=config.TTA):
+    # image: decoded BGR uint8 (see dermacare.ingest); image_bytes: the raw upload, used as the cache key.
+    # `wait` is entered while blocking on the batcher, e.g. to show a spinner.  With a higher-resolution `source`
+    # image, `tta_mode` decides whether the answer comes from test-time augmentation instead.
+    if source is not None and tta_mode == "always":
+        return _predict_tta(source, image_bytes, model_path, wait)
+    key, prediction = lookup(image_bytes, model_path)
+    if prediction is None:
+        future = get_batcher(model_path).submit(image)
+        with wait():
+            prediction = future.result()
+        store(key, prediction)
+    single = result(prediction, model_path)
+    if source is not None and tta.wants_tta(single, tta_mode):
+        return _predict_tta(source, image_bytes, model_path, wait)
+    return single
+
+
+def _predict_tta(source, image_bytes, model_path, wait):
+    key, prediction = lookup(image_bytes, model_path, variant=":tta")
+    if prediction is None:
+        # Submitted back to back so the views share one forward pass
+        batcher = get_batcher(model_path)
+        futures = [batcher.submit(view) for view in tta.views(source)]
+        with wait():
+            prediction = tta.combine([future.result() for future in futures])
+        store(key, prediction)
+    return result(prediction, model_path)
+
+
+def similar_cases(image, image_bytes, model_path=config.MODEL_PATH, wait=contextlib.nullcontext,
+                  k=config.SIMILAR_CASES, index_dir=config.INDEX_DIR):
+    # Nearest reference images to the upload, most similar first; empty without a built index.  The upload's
+    # embedding is cached like its prediction and computed by the batcher (or worker processes) on a miss.
+    index = get_index(index_dir, model_path) if k > 0 else None
+    if index is None:
+        return []
+    key, embedding = lookup(image_bytes, model_path, variant=":embedding")
+    if embedding is None:
+        future = get_batcher(model_path, output="embeddings").submit(image)
+        with wait():
+            embedding = future.result()
+        store(key, embedding)
+    return index.search(embedding, k)
+
+
+def reference_copy(image_bytes, model_path=config.MODEL_PATH, index_dir=config.INDEX_DIR):
+    # The reference case the upload is a byte-for-byte copy of, or None
+    index = get_index(index_dir, model_path)
+    return index.find_copy(image_bytes) if index is not None else None
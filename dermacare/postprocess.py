@@ -0,0 +1,92 @@
+"""Top-k classes with temperature-calibrated confidence and abstention.
+
+Everything operates on (N, C) probability arrays in one vectorized pass, so
+the Streamlit page, the batch CLI and the HTTP API share the same code.  The
+temperature is fitted offline by ``dermacare.calibrate`` and stored in
+``<model>.calibration.json``; without that file it defaults to 1 (no change).
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from dermacare import config
+
+_EPSILON = 1e-7
+
+
+@dataclass(frozen=True)
+class Result:
+    classes: tuple  # top-k class names, most likely first
+    probabilities: tuple  # calibrated probabilities matching `classes`
+    abstained: bool
+
+    @property
+    def predicted_class(self):
+        return self.classes[0]
+
+    @property
+    def confidence(self):
+        return self.probabilities[0]
+
+
+def calibration_path(model_path):
+    return os.path.splitext(model_path)[0] + ".calibration.json"
+
+
+_lock = threading.Lock()
+_temperatures = {}  # abspath -> (mtime_ns or None, temperature)
+
+
+def load_temperature(model_path=config.MODEL_PATH):
+    path = os.path.abspath(calibration_path(model_path))
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 1.0
+    entry = _temperatures.get(path)
+    if entry is None or entry[0] != mtime_ns:
+        with open(path) as f:
+            temperature = float(json.load(f)["temperature"])
+        if temperature <= 0:
+            raise ValueError(f"{path} has a non-positive temperature {temperature}")
+        with _lock:
+            entry = _temperatures[path] = (mtime_ns, temperature)
+    return entry[1]
+
+
+def apply_temperature(probabilities, temperature):
+    # Temperature-scale softmax outputs: softmax(log(p) / T)
+    probabilities = np.asarray(probabilities, dtype=np.float32)
+    if temperature == 1.0:
+        return probabilities
+    logits = np.log(np.clip(probabilities, _EPSILON, 1.0)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=-1, keepdims=True)
+
+
+def top_k(probabilities, k):
+    # (indices, probabilities) of the k largest entries per row, sorted descending
+    probabilities = np.atleast_2d(probabilities)
+    k = min(k, probabilities.shape[-1])
+    if k < probabilities.shape[-1]:
+        indices = np.argpartition(probabilities, -k, axis=-1)[:, -k:]
+    else:
+        indices = np.broadcast_to(np.arange(k), probabilities.shape).copy()
+    values = np.take_along_axis(probabilities, indices, axis=-1)
+    order = np.argsort(-values, axis=-1)
+    return np.take_along_axis(indices, order, axis=-1), np.take_along_axis(values, order, axis=-1)
+
+
+def postprocess(probabilities, class_names, k=config.TOP_K, temperature=1.0, threshold=config.ABSTAIN_THRESHOLD):
+    # (N, C) or (C,) probabilities -> one Result per row
+    calibrated = apply_temperature(np.atleast_2d(probabilities), temperature)
+    indices, values = top_k(calibrated, k)
+    abstained = values[:, 0] < threshold
+    return [Result(classes=tuple(class_names[i] for i in row_indices), probabilities=tuple(map(float, row_values)),
+                   abstained=bool(row_abstained))
+            for row_indices, row_values, row_abstained in zip(indices, values, abstained)]
@@ -0,0 +1,113 @@
+"""Content-addressed cache of probability vectors.
+
+Keys are a SHA-256 of the raw upload bytes plus the model version, so a
+re-uploaded photo or a repeated Predict click skips decode and inference,
+and replacing the model file invalidates every entry.  An in-memory LRU tier
+is backed by an optional SQLite tier that survives restarts.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from dermacare import config
+from dermacare.metrics import register_collector
+
+
+class PredictionCache:
+    def __init__(self, max_entries=config.CACHE_MAX_ENTRIES, ttl_seconds=config.CACHE_TTL_SECONDS,
+                 disk_path=config.CACHE_DISK_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = self.disk_hits = self.misses = 0
+        self._entries = OrderedDict()  # key -> (stored_at, probabilities)
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS predictions "
+                             "(key TEXT PRIMARY KEY, stored_at REAL NOT NULL, probabilities BLOB NOT NULL)")
+            self._db.commit()
+
+    @staticmethod
+    def key(data, model_version):
+        return hashlib.sha256(model_version.encode() + b"\0" + data).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT stored_at, probabilities FROM predictions WHERE key = ?",
+                                       (key,)).fetchone()
+                if row is not None and now - row[0] <= self.ttl_seconds:
+                    probabilities = np.frombuffer(row[1], dtype=np.float32)
+                    self._remember(key, row[0], probabilities)
+                    self.disk_hits += 1
+                    return probabilities
+
+            self.misses += 1
+            return None
+
+    def put(self, key, probabilities):
+        probabilities = np.array(probabilities, dtype=np.float32)
+        probabilities.setflags(write=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, probabilities)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                                 (key, now, probabilities.tobytes()))
+                self._db.execute("DELETE FROM predictions WHERE stored_at < ?", (now - self.ttl_seconds,))
+                self._db.commit()
+
+    def _remember(self, key, stored_at, probabilities):
+        self._entries[key] = (stored_at, probabilities)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+_lock = threading.Lock()
+_cache = None
+
+
+def get_prediction_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = PredictionCache()
+                register_collector(_cache_metrics)
+    return _cache
+
+
+def _cache_metrics():
+    stats = _cache.stats()
+    for tier, hits in (("memory", stats["hits"]), ("disk", stats["disk_hits"])):
+        yield "dermacare_cache_hits_total", "counter", "Prediction cache hits.", {"tier": tier}, hits
+    yield "dermacare_cache_misses_total", "counter", "Prediction cache misses.", {}, stats["misses"]
+    yield "dermacare_cache_hit_ratio", "gauge", "Prediction cache hit rate.", {}, stats["hit_rate"]
+    yield "dermacare_cache_entries", "gauge", "Entries in the in-memory cache tier.", {}, stats["entries"]
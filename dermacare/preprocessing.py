@@ -0,0 +1,65 @@
+"""Image preprocessing shared by every inference entry point.
+
+Decoded images are BGR uint8 (as returned by cv2).  Resized pixels are
+divided straight into the float32 model input, without the float64
+intermediate that ``img / 255.0`` allocates.
+"""
+
+import cv2
+import numpy as np
+
+from dermacare import config
+
+CHANNEL_ORDERS = ("BGR", "RGB")
+_SCALE = np.float32(255)
+
+
+def _check_channel_order(channel_order):
+    if channel_order not in CHANNEL_ORDERS:
+        raise ValueError(f"channel_order must be one of {CHANNEL_ORDERS}, not {channel_order!r}")
+
+
+def _fill(image, out, staging, channel_order):
+    # Resize (if needed), reorder channels and normalize `image` into the float32 slot `out`
+    size = out.shape[0]
+    if image.shape[:2] != (size, size):
+        image = cv2.resize(image, (size, size), dst=staging)
+    if channel_order == "RGB":
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=staging)
+    np.divide(image, _SCALE, out=out)
+
+
+def preprocess(image, channel_order=config.CHANNEL_ORDER):
+    # Single image -> new (64, 64, 3) float32 array in [0, 1]
+    _check_channel_order(channel_order)
+    size = config.IMAGE_SIZE
+    out = np.empty((size, size, 3), np.float32)
+    _fill(image, out, np.empty((size, size, 3), np.uint8), channel_order)
+    return out
+
+
+class Preprocessor:
+    """Preprocesses batches into a reusable float32 buffer.
+
+    The returned array is a view of the buffer and is overwritten by the next
+    call, so an instance must not be shared between threads.
+    """
+
+    def __init__(self, max_batch_size, channel_order=config.CHANNEL_ORDER, size=config.IMAGE_SIZE):
+        _check_channel_order(channel_order)
+        self.channel_order = channel_order
+        self._batch = np.empty((max_batch_size, size, size, 3), np.float32)
+        self._staging = np.empty((size, size, 3), np.uint8)
+
+    @property
+    def max_batch_size(self):
+        return len(self._batch)
+
+    def __call__(self, images, out=None):
+        # `out` optionally replaces the internal buffer, e.g. with a shared-memory slot
+        batch = self._batch if out is None else out
+        if len(images) > len(batch):
+            raise ValueError(f"batch of {len(images)} exceeds the buffer size {len(batch)}")
+        for image, slot in zip(images, batch):
+            _fill(image, slot, self._staging, self.channel_order)
+        return batch[:len(images)]
@@ -0,0 +1,45 @@
+"""Background pre-warming of the ML stack.
+
+``main.py`` imports TensorFlow and OpenCV only when the Prediction page is
+first opened, so Home and Contact render without paying for them.  Once a
+page has rendered, ``start_prewarm`` imports the stack and loads the model in
+a daemon thread, so a later visit to Prediction usually finds it ready.  The
+static images are preloaded by the same thread.
+"""
+
+import logging
+import threading
+
+from dermacare import config
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_thread = None
+
+
+def _prewarm(path, assets):
+    try:
+        from dermacare.assets import get_asset_manager
+        from dermacare.recommendations import content_assets
+
+        get_asset_manager().preload(list(assets) + content_assets())
+    except Exception:
+        logger.warning("Preloading assets failed", exc_info=True)
+
+    try:
+        from dermacare.batching import get_batcher
+
+        get_batcher(path)
+    except Exception:
+        # The Prediction page reports the error to the user when it loads the model itself
+        logger.warning("Pre-warming %s failed", path, exc_info=True)
+
+
+def start_prewarm(path=config.MODEL_PATH, assets=()):
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_prewarm, args=(path, assets), name="dermacare-prewarm", daemon=True)
+            _thread.start()
+    return _thread
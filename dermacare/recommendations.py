@@ -0,0 +1,112 @@
+"""Recommendation content store.
+
+Each ``content/*.json`` file holds the treatment, do's-and-don'ts and diet
+sections for one class.  The files are parsed and their paragraphs rendered
+to HTML once, then looked up by class name; edited or added files are picked
+up within ``CONTENT_RECHECK_SECONDS`` without restarting the app.
+"""
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import streamlit as st
+from streamlit_space import space
+
+from dermacare import config
+from dermacare.assets import get_asset
+
+_PARAGRAPH_STYLE = "font-size: 20px; text-align: justify;"
+_COLUMNS = [1.3, 0.05, 0.7]
+
+
+@dataclass(frozen=True)
+class Section:
+    heading: str
+    html: str
+    image: str
+    image_width: int
+    image_spacer_html: str
+
+
+@dataclass(frozen=True)
+class Recommendation:
+    class_name: str
+    title: str
+    sections: tuple
+
+
+def _render_section(section):
+    return Section(
+        heading=section["heading"],
+        html=f"<p style='{_PARAGRAPH_STYLE}'> " + " <br><br> ".join(section["paragraphs"]) + "</p>",
+        image=section["image"],
+        image_width=section.get("image_width", 400),
+        image_spacer_html=f"<p style='margin-top: {section.get('image_offset', 0)}px;'> </p>",
+    )
+
+
+def load_content(directory=config.CONTENT_DIR):
+    recommendations = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(directory, name)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        try:
+            recommendation = Recommendation(class_name=data["class"], title=data["title"],
+                                            sections=tuple(_render_section(s) for s in data["sections"]))
+        except KeyError as exc:
+            raise ValueError(f"{path} is missing the {exc.args[0]!r} field") from exc
+        if recommendation.class_name in recommendations:
+            raise ValueError(f"{path} duplicates the content for {recommendation.class_name!r}")
+        recommendations[recommendation.class_name] = recommendation
+    return recommendations
+
+
+_lock = threading.Lock()
+_store = {}  # abspath -> (directory signature, monotonic time it was taken, {class name: Recommendation})
+
+
+def _signature(directory):
+    return tuple(sorted((entry.name, entry.stat().st_mtime_ns) for entry in os.scandir(directory)
+                        if entry.name.endswith(".json")))
+
+
+def get_recommendation(class_name, directory=config.CONTENT_DIR, recheck_seconds=config.CONTENT_RECHECK_SECONDS):
+    # Scanning the directory costs a stat per file, so it is done at most once every `recheck_seconds`
+    directory = os.path.abspath(directory)
+    entry = _store.get(directory)
+    now = time.monotonic()
+    if entry is None or now - entry[1] >= recheck_seconds:
+        signature = _signature(directory)
+        with _lock:
+            content = entry[2] if entry is not None and entry[0] == signature else load_content(directory)
+            entry = _store[directory] = (signature, now, content)
+    return entry[2].get(class_name)
+
+
+def content_assets(directory=config.CONTENT_DIR):
+    # (image, width) pairs referenced by the content, for preloading
+    return sorted({(section.image, section.image_width)
+                   for recommendation in load_content(directory).values() for section in recommendation.sections})
+
+
+def render_recommendation(recommendation):
+    with st.expander(recommendation.title):
+        for index, section in enumerate(recommendation.sections):
+            if index:
+                st.divider()
+            with st.container():
+                c1, _, c2 = st.columns(_COLUMNS)
+                with c1:
+                    st.header(section.heading)
+                    st.markdown(section.html, unsafe_allow_html=True)
+                with c2:
+                    st.markdown(section.image_spacer_html, unsafe_allow_html=True)
+                    st.image(get_asset(section.image, section.image_width), width=section.image_width)
+                space()
+                space()
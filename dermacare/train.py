@@ -0,0 +1,174 @@
+"""Train the 64x64 classifier from a class-folder tree.
+
+    python -m dermacare.train train --epochs 30 --cache .cache/train
+
+Images are decoded and resized in parallel by a tf.data pipeline and cached
+(to a file when ``--cache`` is given, which later runs reuse), so no epoch
+decodes JPEGs; augmentation runs after the cache and batches are prefetched.
+Inputs follow ``DERMACARE_CHANNEL_ORDER`` so the model matches serving.  The
+model is saved as .h5 together with its label manifest, and each epoch
+reports its throughput.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import tensorflow as tf
+from tensorflow import keras
+
+from dermacare import config
+from dermacare.batch_predict import iter_image_paths
+from dermacare.labels import write_manifest
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def list_examples(data_dir):
+    class_names = sorted(entry.name for entry in os.scandir(data_dir) if entry.is_dir())
+    paths, labels = [], []
+    for index, name in enumerate(class_names):
+        for path in iter_image_paths([os.path.join(data_dir, name)]):
+            paths.append(path)
+            labels.append(index)
+    return class_names, paths, labels
+
+
+def decode(path, label):
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, (config.IMAGE_SIZE, config.IMAGE_SIZE), antialias=True)
+    if config.CHANNEL_ORDER == "BGR":
+        # tf decodes RGB; serving feeds cv2's BGR
+        image = image[..., ::-1]
+    return tf.cast(tf.round(tf.clip_by_value(image, 0, 255)), tf.uint8), label
+
+
+def augment(image, label):
+    image = tf.image.convert_image_dtype(image, tf.float32)
+    image = tf.image.random_flip_left_right(image)
+    image = tf.image.random_flip_up_down(image)
+    image = tf.image.rot90(image, tf.random.uniform((), 0, 4, dtype=tf.int32))
+    image = tf.image.random_brightness(image, 0.1)
+    image = tf.image.random_contrast(image, 0.9, 1.1)
+    return tf.clip_by_value(image, 0.0, 1.0), label
+
+
+def normalize(image, label):
+    return tf.image.convert_image_dtype(image, tf.float32), label
+
+
+def cache_name(prefix, split, paths, labels):
+    # Tie the cache files to the exact file list and preprocessing so a changed tree never reuses stale data
+    digest = hashlib.sha256(repr((paths, labels, config.IMAGE_SIZE, config.CHANNEL_ORDER)).encode()).hexdigest()
+    return f"{prefix}.{split}-{digest[:12]}"
+
+
+def decoded_dataset(paths, labels, cache):
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(decode, num_parallel_calls=AUTOTUNE, deterministic=False)
+    # Decoded 64x64 uint8 images are cached; later epochs never touch the JPEGs again
+    return dataset.cache(cache)
+
+
+def fill_cache(dataset, name):
+    # Read the cached dataset once end to end; a partial read would make tf.data discard the cache
+    start = time.perf_counter()
+    count = sum(int(tf.shape(labels)[0]) for _, labels in dataset.batch(256))
+    elapsed = time.perf_counter() - start
+    print(f"{name}: decoded/cached {count} images at {count / elapsed:.1f} samples/sec", file=sys.stderr)
+
+
+def training_pipeline(dataset, size, batch_size, seed):
+    dataset = dataset.shuffle(size, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.map(augment, num_parallel_calls=AUTOTUNE, deterministic=False)
+    return dataset.batch(batch_size).prefetch(AUTOTUNE)
+
+
+def evaluation_pipeline(dataset, batch_size):
+    return dataset.map(normalize, num_parallel_calls=AUTOTUNE).batch(batch_size).prefetch(AUTOTUNE)
+
+
+def build_model(num_classes):
+    size = config.IMAGE_SIZE
+    return keras.Sequential([
+        keras.Input((size, size, 3)),
+        keras.layers.Conv2D(32, 3, padding="same", activation="relu"),
+        keras.layers.MaxPooling2D(),
+        keras.layers.Conv2D(64, 3, padding="same", activation="relu"),
+        keras.layers.MaxPooling2D(),
+        keras.layers.Conv2D(128, 3, padding="same", activation="relu"),
+        keras.layers.MaxPooling2D(),
+        keras.layers.Flatten(),
+        keras.layers.Dense(128, activation="relu"),
+        keras.layers.Dropout(0.5),
+        keras.layers.Dense(num_classes, activation="softmax"),
+    ])
+
+
+class Throughput(keras.callbacks.Callback):
+    def __init__(self, samples_per_epoch):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        print(f"epoch {epoch + 1}: {self.samples_per_epoch / elapsed:.1f} samples/sec ({elapsed:.1f}s)",
+              file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the skin disease classifier on a class-folder tree.")
+    parser.add_argument("data_dir", nargs="?", default="train")
+    parser.add_argument("--output", default=config.MODEL_PATH)
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--validation-split", type=float, default=0.1)
+    parser.add_argument("--cache", help="file prefix for the decoded-image cache; in memory when omitted")
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args(argv)
+
+    keras.utils.set_random_seed(args.seed)
+    class_names, paths, labels = list_examples(args.data_dir)
+    if len(class_names) < 2:
+        parser.error(f"{args.data_dir} needs at least two class folders, found {len(class_names)}")
+
+    # Fixed shuffled split so the cache files stay valid across runs with the same seed
+    order = tf.random.experimental.stateless_shuffle(tf.range(len(paths)), seed=[args.seed, 0]).numpy()
+    paths, labels = [paths[i] for i in order], [labels[i] for i in order]
+    n_val = int(len(paths) * args.validation_split)
+    train_paths, train_labels = paths[n_val:], labels[n_val:]
+    val_paths, val_labels = paths[:n_val], labels[:n_val]
+
+    cache = args.cache
+    if cache:
+        os.makedirs(os.path.dirname(os.path.abspath(cache)), exist_ok=True)
+    train_cache = cache_name(cache, "train", train_paths, train_labels) if cache else ""
+    train_cached = decoded_dataset(train_paths, train_labels, train_cache)
+    fill_cache(train_cached, "train")
+    train_ds = training_pipeline(train_cached, len(train_paths), args.batch_size, args.seed)
+    val_ds = None
+    if val_paths:
+        val_cache = cache_name(cache, "val", val_paths, val_labels) if cache else ""
+        val_cached = decoded_dataset(val_paths, val_labels, val_cache)
+        fill_cache(val_cached, "validation")
+        val_ds = evaluation_pipeline(val_cached, args.batch_size)
+
+    model = build_model(len(class_names))
+    model.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+    print(f"training on {len(train_paths)} images ({len(val_paths)} validation), {len(class_names)} classes",
+          file=sys.stderr)
+    model.fit(train_ds, validation_data=val_ds, epochs=args.epochs, callbacks=[Throughput(len(train_paths))],
+              shuffle=False, verbose=2)
+
+    model.save(args.output)
+    print(f"wrote {args.output} and {write_manifest(args.output, class_names)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Test-time augmentation over flips and crops of the decoded upload.
+
+A 64x64 downscale of a whole phone photo can shrink a lesion to a few pixels.
+``views`` adds flips, a center crop and a crop around the lesion, located by
+an Otsu threshold on a small grayscale copy (lesions are usually darker than
+the surrounding skin), all resized to the model input.  The views are
+submitted together so they share one forward pass, and ``combine`` averages
+their softmax outputs.
+"""
+
+import cv2
+import numpy as np
+
+from dermacare import config
+
+MODES = ("off", "uncertain", "always")
+CENTER_CROP = 0.8  # share of the shorter side kept by the center crop
+LESION_MARGIN = 1.4  # crop side relative to the lesion's bounding box
+_SALIENCY_SIDE = 256
+# Lesion area bounds as a share of the image.  The lower bound only rejects specks: a 120 px lesion in a 12 MP
+# photo covers 0.1% of it.
+_MIN_AREA, _MAX_AREA = 0.0002, 0.6
+_MIN_EDGE = 4  # grey levels a blob must be darker than the ring around it; Otsu splits even plain skin in two
+
+
+def wants_tta(result, mode=config.TTA):
+    if mode not in MODES:
+        raise ValueError(f"TTA mode must be one of {MODES}, not {mode!r}")
+    return mode == "always" or (mode == "uncertain" and result.abstained)
+
+
+def lesion_box(image):
+    # (x, y, side) of a square around the largest dark blob, or None when there is no plausible lesion
+    height, width = image.shape[:2]
+    scale = min(1.0, _SALIENCY_SIDE / max(height, width))
+    small = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                       interpolation=cv2.INTER_AREA)
+    gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask)
+    if count < 2:
+        return None
+
+    # Blobs touching the border are more often shadows or background than the lesion
+    x, y, w, h = stats[:, 0], stats[:, 1], stats[:, 2], stats[:, 3]
+    inner = (x > 0) & (y > 0) & (x + w < mask.shape[1]) & (y + h < mask.shape[0])
+    inner[0] = False  # the background component
+    candidates = np.flatnonzero(inner) if inner.any() else np.arange(1, count)
+    blob = candidates[np.argmax(stats[candidates, cv2.CC_STAT_AREA])]
+    bx, by, bw, bh, area = stats[blob]
+    if not _MIN_AREA <= area / mask.size <= _MAX_AREA:
+        return None
+    inside = (labels == blob).astype(np.uint8)
+    ring = cv2.dilate(inside, np.ones((7, 7), np.uint8)) > inside
+    if gray[ring].mean() - gray[inside > 0].mean() < _MIN_EDGE:
+        return None
+
+    side = min(min(height, width), max(config.IMAGE_SIZE, round(max(bw, bh) / scale * LESION_MARGIN)))
+    cx, cy = (bx + bw / 2) / scale, (by + bh / 2) / scale
+    left = int(np.clip(round(cx - side / 2), 0, width - side))
+    top = int(np.clip(round(cy - side / 2), 0, height - side))
+    return left, top, side
+
+
+def _resize(image):
+    return cv2.resize(image, (config.IMAGE_SIZE, config.IMAGE_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def views(image):
+    # BGR uint8 model inputs: the whole image (as served without TTA), flips, a center crop and the lesion crop
+    height, width = image.shape[:2]
+    full = _resize(image)
+    side = max(1, round(min(height, width) * CENTER_CROP))
+    top, left = (height - side) // 2, (width - side) // 2
+    center = _resize(image[top:top + side, left:left + side])
+    out = [full, cv2.flip(full, 1), cv2.flip(full, 0), center, cv2.flip(center, 1)]
+
+    box = lesion_box(image)
+    if box is not None:
+        left, top, side = box
+        lesion = _resize(image[top:top + side, left:left + side])
+        out += [lesion, cv2.flip(lesion, 1)]
+    return out
+
+
+def combine(probabilities):
+    # (K, classes) softmax outputs of the views -> one averaged probability vector
+    return np.mean(probabilities, axis=0, dtype=np.float32)
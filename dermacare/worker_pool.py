@@ -0,0 +1,279 @@
+"""Multi-process inference workers fed through shared memory.
+
+With ``DERMACARE_WORKERS`` > 0 the batcher hands each batch to a pool of
+worker processes instead of running the model in the server process, so one
+busy session cannot starve the others of the GIL or of TensorFlow's thread
+pools, and core usage is fixed by the pool size times each worker's
+intra/inter-op thread budget.  Every worker loads its own model copy and owns
+a ring of shared-memory batch slots: the parent preprocesses a batch straight
+into a free slot and sends only ``(slot, count)`` down a queue, so image
+arrays are never pickled.  Probabilities (a few floats per image) come back
+on a result queue.  A worker that dies is restarted and the batches it was
+running fail with ``WorkerCrashed``.
+"""
+
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from dermacare import config
+from dermacare.metrics import observe_stage, register_collector, timer
+from dermacare.preprocessing import Preprocessor
+
+logger = logging.getLogger(__name__)
+
+_READY = "ready"
+_FAILED = "failed"
+_WATCH_SECONDS = 0.5
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+class RingBuffer:
+    # `slots` batches of (max_batch_size, size, size, 3) float32 in one shared-memory block
+    def __init__(self, slots, max_batch_size, size=config.IMAGE_SIZE, name=None):
+        shape = (slots, max_batch_size, size, size, 3)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 4)
+        else:
+            # Spawned workers share the parent's resource tracker, so attaching does not take over the unlink
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.shape = shape
+        self.slots = np.ndarray(shape, np.float32, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self, unlink=False):
+        self.slots = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _worker_main(index, model_path, ring_name, ring_shape, intra_op_threads, inter_op_threads, tasks, results):
+    # Runs in a spawned process; the thread budget must be set before TensorFlow creates its pools
+    config.TFLITE_THREADS = intra_op_threads
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    from dermacare.inference import get_embedding_engine, get_engine
+
+    ring = RingBuffer(ring_shape[0], ring_shape[1], ring_shape[2], name=ring_name)
+    try:
+        num_classes = get_engine(model_path).num_classes
+    except Exception as exc:
+        results.put((_FAILED, index, f"{type(exc).__name__}: {exc}"))
+        return
+    results.put((_READY, index, num_classes))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, slot, count, output = task
+        try:
+            if output == "embeddings":
+                outcome = get_embedding_engine(model_path).embed(ring.slots[slot, :count])
+            else:
+                outcome = get_engine(model_path).predict(ring.slots[slot, :count])
+        except Exception as exc:
+            outcome = RuntimeError(f"inference worker {index}: {type(exc).__name__}: {exc}")
+        results.put((request_id, index, slot, outcome))
+    ring.close()
+
+
+class WorkerPool:
+    def __init__(self, model_path=config.MODEL_PATH, workers=config.WORKERS,
+                 intra_op_threads=config.WORKER_INTRA_OP_THREADS, inter_op_threads=config.WORKER_INTER_OP_THREADS,
+                 slots=config.WORKER_SLOTS, max_batch_size=config.BATCH_MAX_SIZE, start_timeout=300):
+        if workers < 1 or slots < 1:
+            raise ValueError("a worker pool needs at least one worker and one slot per worker")
+        self.model_path = os.path.abspath(model_path)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.num_classes = None
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")  # forking a process that has loaded TF is unsafe
+        self._results = self._context.Queue()
+        self._rings = [RingBuffer(slots, max_batch_size) for _ in range(workers)]
+        self._tasks = [None] * workers
+        self._processes = [None] * workers
+        self._ready = [threading.Event() for _ in range(workers)]
+        self._errors = {}
+        # Free (worker, slot) pairs, interleaved so consecutive batches go to different workers
+        self._free = queue.Queue()
+        for slot in range(slots):
+            for worker in range(workers):
+                self._free.put((worker, slot))
+        self._pending = {}  # request id -> (worker, slot, future, dispatched at)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._preprocess_lock = threading.Lock()
+        self._preprocessor = Preprocessor(max_batch_size)
+        self._closed = False
+
+        for worker in range(workers):
+            self._start(worker)
+        threading.Thread(target=self._collect, name="dermacare-pool-results", daemon=True).start()
+        deadline = time.monotonic() + start_timeout
+        for event in self._ready:
+            event.wait(max(0.0, deadline - time.monotonic()))
+        if self._errors or not all(event.is_set() for event in self._ready):
+            self.close()
+            raise RuntimeError(f"inference workers failed to start: {self._errors or 'timed out'}")
+        threading.Thread(target=self._watch, name="dermacare-pool-watchdog", daemon=True).start()
+
+    @property
+    def workers(self):
+        return len(self._processes)
+
+    def alive(self):
+        return sum(process.is_alive() for process in self._processes)
+
+    def free_slots(self):
+        return self._free.qsize()
+
+    def _start(self, worker):
+        # Called with self._lock held after a crash; a fresh task queue drops whatever the dead worker left behind
+        ring = self._rings[worker]
+        self._tasks[worker] = self._context.Queue()
+        self._ready[worker].clear()
+        process = self._context.Process(
+            target=_worker_main, name=f"dermacare-worker-{worker}", daemon=True,
+            args=(worker, self.model_path, ring.name, ring.shape[:3], self.intra_op_threads,
+                  self.inter_op_threads, self._tasks[worker], self._results))
+        process.start()
+        self._processes[worker] = process
+
+    def submit(self, images, output="probabilities"):
+        # Preprocess into a free slot (blocking while every slot is busy) and resolve to (N, classes) probabilities,
+        # or to (N, dim) penultimate-layer embeddings with output="embeddings"
+        worker, slot = self._free.get()
+        future = Future()
+        try:
+            with self._preprocess_lock, timer("preprocess"):
+                self._preprocessor(images, out=self._rings[worker].slots[slot])
+        except BaseException:
+            self._free.put((worker, slot))
+            raise
+        request_id = next(self._ids)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("worker pool is closed")
+            self._pending[request_id] = (worker, slot, future, time.perf_counter())
+            self._tasks[worker].put((request_id, slot, len(images), output))
+        return future
+
+    def predict(self, images, output="probabilities"):
+        return self.submit(images, output).result()
+
+    def _collect(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            if message[0] == _READY:
+                _, worker, self.num_classes = message
+                self._ready[worker].set()
+                continue
+            if message[0] == _FAILED:
+                _, worker, error = message
+                logger.error("Inference worker %d could not load %s: %s", worker, self.model_path, error)
+                self._errors[worker] = error
+                self._ready[worker].set()
+                continue
+
+            request_id, worker, slot, outcome = message
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+            if entry is None:
+                continue  # failed over by the watchdog; the slot was already reclaimed
+            self._free.put((worker, slot))
+            future, dispatched = entry[2], entry[3]
+            observe_stage("inference", time.perf_counter() - dispatched)
+            if isinstance(outcome, BaseException):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    def _watch(self):
+        while not self._closed:
+            time.sleep(_WATCH_SECONDS)
+            for worker, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                with self._lock:
+                    if self._closed:
+                        return
+                    lost = [(request_id, entry) for request_id, entry in self._pending.items() if entry[0] == worker]
+                    for request_id, _ in lost:
+                        del self._pending[request_id]
+                    self.restarts += 1
+                    self._start(worker)
+                logger.warning("Inference worker %d exited with code %s; restarted it (%d batches lost)",
+                               worker, process.exitcode, len(lost))
+                for _, (_, slot, future, _) in lost:
+                    self._free.put((worker, slot))
+                    future.set_exception(WorkerCrashed(f"inference worker {worker} exited with code "
+                                                       f"{process.exitcode}"))
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            lost, self._pending = list(self._pending.values()), {}
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._results.put(None)
+        for _, _, future, _ in lost:
+            future.set_exception(RuntimeError("worker pool closed"))
+        for ring in self._rings:
+            ring.close(unlink=True)
+
+
+_pools_lock = threading.Lock()
+_pools = {}  # abspath -> pool
+
+
+def get_pool(path=config.MODEL_PATH):
+    path = os.path.abspath(path)
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = WorkerPool(path)
+                atexit.register(pool.close)
+    return pool
+
+
+def _pool_metrics():
+    for path, pool in list(_pools.items()):
+        labels = {"model": os.path.basename(path)}
+        yield "dermacare_workers_alive", "gauge", "Inference worker processes running.", labels, pool.alive()
+        yield ("dermacare_worker_restarts_total", "counter", "Inference workers restarted after exiting.", labels,
+               pool.restarts)
+        yield "dermacare_worker_free_slots", "gauge", "Shared-memory batch slots not in use.", labels, pool.free_slots()
+
+
+register_collector(_pool_metrics)
@@ -1,18 +1,22 @@
+import itertools
+
 import streamlit as st
-from tensorflow import keras
-import cv2
-import numpy as np
-import os
 from streamlit_option_menu import option_menu
-import json
 from streamlit_extras.stylable_container import stylable_container
 from streamlit_space import space
 from streamlit_lottie import st_lottie_spinner
+from streamlit.logger import get_logger
+from dermacare import config
+from dermacare.assets import get_asset, load_lottie, load_thumbnail
+from dermacare.metrics import counter, maybe_profile, start_metrics_server, timer
+from dermacare.prewarm import start_prewarm
 
+# Images shown on the Home and Contact pages, at their display widths
+PAGE_ASSETS = [("logo.png", 200), ("vitiligo.webp", 500), ("candidiasis.webp", 450), ("melnoma.jpg", 500),
+               ("eczema.webp", 500), ("f1.gif", None)]
 
-def load_lottiefile(filepath: str):
-    with open(filepath, "r") as f:
-        return json.load(f)
+# Streamlit only configures its own loggers; give dermacare's (asset and model load times, etc.) the same console
+get_logger("dermacare")
 
 
 # Page Loader
@@ -39,7 +43,7 @@ if selected == "Home":
     with title_container:
         c1, _, c2 = st.columns([0.1, 0.01, 0.8])
         with c1:
-            st.image("logo.png")
+            st.image(get_asset("logo.png", 200))
         with c2:
             st.title("DermaCare")
             st.markdown(
@@ -71,7 +75,7 @@ if selected == "Home":
                 "impact on a person's self-esteem. <br><br> ⭕Treatment options include topical corticosteroids, "
                 "light therapy, and skin grafting. </p>", unsafe_allow_html=True)
         with c2:
-            st.image("vitiligo.webp", width=500)
+            st.image(get_asset("vitiligo.webp", 500), width=500)
         space()
         space()
     st.divider()
@@ -92,7 +96,7 @@ if selected == "Home":
                 "essential to prevent complications. </p>", unsafe_allow_html=True)
 
         with c2:
-            st.image("candidiasis.webp", width=450)
+            st.image(get_asset("candidiasis.webp", 450), width=450)
         space()
         space()
     st.divider()
@@ -115,7 +119,7 @@ if selected == "Home":
                 "outcomes.</p>", unsafe_allow_html=True)
         with c2:
             st.markdown("<p style='margin-top: 80px;'> </p>", unsafe_allow_html=True)
-            st.image("melnoma.jpg", width=500)
+            st.image(get_asset("melnoma.jpg", 500), width=500)
         space()
         space()
     st.divider()
@@ -138,7 +142,7 @@ if selected == "Home":
 
         with c2:
             st.markdown("<p style='margin-top: 80px;'> </p>", unsafe_allow_html=True)
-            st.image("eczema.webp", width=500)
+            st.image(get_asset("eczema.webp", 500), width=500)
         space()
         space()
     st.divider()
@@ -146,26 +150,33 @@ if selected == "Home":
 
 # Prediction
 elif selected == "Prediction":
-    # Load the trained model
-    model = keras.models.load_model('skin_disease_classification_model.h5')
+    # The ML stack (TensorFlow, OpenCV) is imported on first entry to this page only
+    from dermacare import pipeline
+    from dermacare.ingest import UploadRejected, ingest
+    from dermacare.labels import LabelManifestError
+    from dermacare.recommendations import get_recommendation, render_recommendation
+
+    # Load the model (once per process) and check its label manifest
+    try:
+        pipeline.class_names(config.MODEL_PATH)
+    except LabelManifestError as exc:
+        st.error(str(exc))
+        st.stop()
+
 
-    # Class names
-    path = 'train'
-    class_names = sorted(os.listdir(path))
+    spinners = itertools.count()
 
 
-    def predict_disease(image):
-        # Resize the input image to match the expected input shape of the model
-        img = cv2.resize(image, (64, 64))  # Resize to (64, 64)
-        img = np.reshape(img, (1, 64, 64, 3))  # Reshape the image to match the input shape
-        img = img / 255.0  # Normalize the image
+    def spinner():
+        # Shown while a result is computed; one click can wait several times (similar cases, the model,
+        # test-time augmentation), each under a new widget key
+        return st_lottie_spinner(load_lottie("contact2.json"), height=200,
+                                 key=f"prediction_spinner_{next(spinners)}")
 
-        # Make prediction
-        prediction = model.predict(img)[0]
-        max_index = np.argmax(prediction)
-        predicted_class = class_names[max_index]
 
-        return predicted_class, prediction
+    def predict_disease(image, image_bytes, source):
+        # Cached by upload bytes; on a miss the batching worker runs the model while the spinner animates
+        return pipeline.predict_disease(image, image_bytes, config.MODEL_PATH, wait=spinner, source=source)
 
 
     # Streamlit app
@@ -174,316 +185,64 @@ elif selected == "Prediction":
     uploaded_file = st.file_uploader("Upload an image of skin lesion", type=['jpg', 'png', 'jpeg'])
 
     if uploaded_file is not None:
+        # Decode at reduced scale into a small preview and the model input, once per upload: reruns such as
+        # repeat Predict clicks reuse the session's copy
+        with timer("upload_read"):
+            image_bytes = uploaded_file.getvalue()
+        cached = st.session_state.get("upload")
+        if cached is not None and cached[0] == uploaded_file.file_id:
+            upload = cached[1]
+        else:
+            try:
+                with timer("decode"):
+                    upload = ingest(image_bytes)
+            except UploadRejected as exc:
+                st.error(str(exc))
+                st.stop()
+            st.session_state["upload"] = (uploaded_file.file_id, upload)
+
         # Display the uploaded image
-        image = cv2.imdecode(np.frombuffer(uploaded_file.read(), np.uint8), 1)
-        st.image(image, caption='Uploaded Image', width=200)
+        st.image(upload.display, caption='Uploaded Image', width=200)
 
         if st.button('Predict'):
-            predicted_class, prediction = predict_disease(image)
-            st.success(f"The skin disease in the image is predicted as: {predicted_class}")
-
-            # Recommendation System
-
-            if predicted_class == "vitiligo":
-                with st.expander("SYSTEM OF VITILIGO RECOMMENDATIONS"):
-                    vitiligo_container1 = st.container()
-                    with vitiligo_container1:
-                        c1,_, c2 = st.columns([1.3,0.05,  0.7])
-                        with c1:
-                            st.header("SKIN CARE TREATMENT")
-                            st.markdown(
-                                "<p style='font-size: 20px; text-align: justify;'> ⭕Skin cancer treatment for "
-                                "vitiligo involves using various methods to manage the condition. Common treatments "
-                                "include topical corticosteroids to reduce inflammation and encourage repigmentation "
-                                "of the skin. <br><br> ⭕Phototherapy, such as UVB therapy, can also help stimulate melanocytes "
-                                "to produce pigment in affected areas. In more severe cases, surgical options like "
-                                "skin grafting or melanocyte transplantation may be considered to restore "
-                                "pigmentation. <br><br> ⭕It is essential for individuals with vitiligo to work closely with "
-                                "dermatologists to determine the most suitable treatment plan based on the extent and "
-                                "progression of their condition, aiming for both cosmetic improvement and overall "
-                                "skin health.</p>", unsafe_allow_html=True)
-                        with c2:
-                            st.markdown("<p style='margin-top: 40px;'> </p>", unsafe_allow_html=True)
-                            st.image("heartbeat.png",
-                                     width=400)
-                        space()
-                        space()
-                    st.divider()
-                    vitiligo_container2 = st.container()
-                    with vitiligo_container2:
-                        c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                        with c1:
-                            st.header("DO'S AND DONT'S")
-                            st.markdown(
-                                "<p style='font-size: 20px; text-align: justify;'> When managing vitiligo, there are "
-                                "important do's and don'ts to consider. <br><br> ⭕Do protect your skin from sun exposure by "
-                                "using sunscreen and wearing protective clothing to prevent sunburn in depigmented "
-                                "areas. <br><br> ⭕Do consult a dermatologist for personalized treatment options, "
-                                "including topical corticosteroids, phototherapy, or surgical interventions. <br><br> ⭕Do seek "
-                                "support from vitiligo support groups and counseling to address any emotional impact. "
-                                "Don't use harsh chemicals or treatments that may aggravate the skin. <br><br> ⭕Don't neglect "
-                                "regular skin checks for signs of skin cancer, especially in depigmented areas. <br><br> ⭕"
-                                "Finally, don't underestimate the importance of self-care and self-acceptance in "
-                                "coping with vitiligo.</p>", unsafe_allow_html=True)
-                        with c2:
-                            st.markdown("<p style='margin-top: 120px;'> </p>", unsafe_allow_html=True)
-                            st.image("allergy.png",
-                                     width=400)
-                        space()
-                        space()
-
-                        st.divider()
-                        vitiligo_container2 = st.container()
-                        with vitiligo_container2:
-                            c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                            with c1:
-                                st.header("DIET PLAN")
-                                st.markdown(
-                                    "<p style='font-size: 20px; text-align: justify;'> ⭕A well-balanced diet plan for "
-                                    "vitiligo focuses on supporting overall skin health and potential repigmentation. "
-                                    "Include foods rich in antioxidants like fruits, vegetables, and green tea to "
-                                    "help combat oxidative stress. <br><br> ⭕Incorporate foods high in vitamins C, E, and D, "
-                                    "as well as minerals like copper and zinc known for their role in skin health. "
-                                    "Consider adding foods with phenylalanine content like dairy, meat, "
-                                    "and soy products, as this amino acid may support repigmentation. <br><br> ⭕Avoiding "
-                                    "trigger foods that may worsen autoimmune responses is also crucial. Consulting a "
-                                    "nutritionist or dermatologist for a personalized diet plan tailored to "
-                                    "individual needs is highly recommended.</p>", unsafe_allow_html=True)
-                            with c2:
-                                st.markdown("<p style='margin-top: 80px;'> </p>", unsafe_allow_html=True)
-                                st.image("diet.png",
-                                         width=400)
-                            space()
-                            space()
-
-            elif predicted_class == "Tinea Ringworm Candidiasis and other Fungal Infections":
-                    with st.expander("SYSTEM OF CANDIDIASIS RECOMMENDATIONS"):
-                        vitiligo_container2 = st.container()
-                        with vitiligo_container2:
-                            c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                            with c1:
-                                st.header("SKIN CARE TREATMENT")
-                                st.markdown(
-                                    "<p style='font-size: 20px; text-align: justify;'> ⭕When addressing skin cancer "
-                                    "treatment for candidiasis, it's essential to understand that candidiasis is a "
-                                    "fungal infection rather than a form of skin cancer. Treatment for candidiasis "
-                                    "typically involves antifungal medications to eliminate the fungal overgrowth on "
-                                    "the skin. <br><br> ⭕Topical antifungal creams, ointments, or oral medications may be "
-                                    "prescribed based on the severity and location of the infection. Proper hygiene "
-                                    "practices, keeping the affected area clean and dry, and avoiding factors that "
-                                    "promote fungal growth are also important aspects of managing candidiasis. "
-                                    "<br><br> ⭕Consulting a healthcare provider for an accurate diagnosis and appropriate "
-                                    "treatment plan tailored to the individual's needs is crucial for effectively "
-                                    "addressing candidiasis.</p>",
-                                    unsafe_allow_html=True)
-                            with c2:
-                                st.markdown("<p style='margin-top: 40px;'> </p>", unsafe_allow_html=True)
-                                st.image("test.png",
-                                         width=400)
-                            space()
-                            space()
-                        st.divider()
-                        vitiligo_container2 = st.container()
-                        with vitiligo_container2:
-                            c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                            with c1:
-                                st.header("DO'S AND DONT'S")
-                                st.markdown(
-                                    "<p style='font-size: 20px; text-align: justify;'> When dealing with candidiasis, "
-                                    "specific do's and don'ts are vital for effective management. <br><br> ⭕Do practice good "
-                                    "hygiene by keeping the affected areas clean and dry to prevent further fungal "
-                                    "growth. <br><br> ⭕Do wear loose-fitting, breathable clothing to promote airflow and reduce "
-                                    "moisture, creating an environment less favorable for candida overgrowth. <br><br> ⭕Do use "
-                                    "antifungal medications as prescribed by a healthcare professional to target the "
-                                    "infection directly. <br><br> ⭕Don't use harsh soaps or irritating products that can "
-                                    "disrupt the natural balance of the skin and exacerbate candidiasis. <br><br> ⭕Don't "
-                                    "scratch or aggravate the infected areas to prevent spreading the infection or "
-                                    "causing skin damage. <br><br> ⭕Adhering to these do's and don'ts can help in effectively "
-                                    "managing candidiasis and promoting skin health.</p>", unsafe_allow_html=True)
-                            with c2:
-                                st.markdown("<p style='margin-top: 120px;'> </p>", unsafe_allow_html=True)
-                                st.image("choice.png",
-                                         width=400)
-                            space()
-                            space()
-
-                            st.divider()
-                            vitiligo_container2 = st.container()
-                            with vitiligo_container2:
-                                c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                                with c1:
-                                    st.header("DIET PLAN")
-                                    st.markdown(
-                                        "<p style='font-size: 20px; text-align: justify;'> ⭕When crafting a diet plan "
-                                        "for candidiasis, focus on reducing foods that promote yeast growth. "
-                                        "Emphasize a diet rich in non-starchy vegetables, low-sugar fruits, "
-                                        "lean protein sources, and healthy fats. Include probiotic-rich foods like "
-                                        "yogurt and kefir to support gut health and balance the microbiome. "
-                                        "<br><br> ⭕Incorporate anti-fungal foods such as garlic, coconut oil, and apple cider "
-                                        "vinegar known for their candida-fighting properties. Limit sugary foods, "
-                                        "refined carbohydrates, and alcohol, as these can exacerbate yeast "
-                                        "overgrowth. <br><br> ⭕Hydration is essential to flush out toxins, so prioritize water "
-                                        "intake. Consulting a healthcare provider or a nutritionist for personalized "
-                                        "dietary recommendations can aid in managing candidiasis effectively.</p>",
-                                        unsafe_allow_html=True)
-                                with c2:
-                                    st.markdown("<p style='margin-top: 80px;'> </p>", unsafe_allow_html=True)
-                                    st.image("checklist.png",
-                                        width=400)
-                                space()
-                                space()
-            elif predicted_class == "Melanoma Skin Cancer Nevi and Moles":
-                with st.expander("SYSTEM OF MELANOMA RECOMMENDATIONS"):
-                    vitiligo_container2 = st.container()
-                    with vitiligo_container2:
-                        c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                        with c1:
-                            st.header("SKIN CARE TREATMENT")
-                            st.markdown(
-                                "<p style='font-size: 20px; text-align: justify;'> ⭕Treatment for melanoma skin "
-                                "cancer typically involves surgical removal of the tumor, along with some surrounding "
-                                "healthy tissue to ensure complete excision. <br><br> ⭕Depending on the stage and spread of the "
-                                "cancer, additional therapies such as immunotherapy, targeted therapy, chemotherapy, "
-                                "or radiation therapy may be recommended to target any remaining cancer cells and "
-                                "reduce the risk of recurrence. Immunotherapy, which harnesses the body's immune "
-                                "system to fight cancer cells, has shown promising results in treating advanced "
-                                "melanoma. <br><br> ⭕Additionally, ongoing monitoring and regular skin checks are essential to "
-                                "detect any potential recurrence or new skin cancers, emphasizing the significance of "
-                                "early detection and timely intervention in managing melanoma.</p>",
-                                unsafe_allow_html=True)
-                        with c2:
-                            st.markdown("<p style='margin-top: 40px;'> </p>", unsafe_allow_html=True)
-                            st.image("hydrated.png",
-                                     width=400)
-                        space()
-                        space()
-                    st.divider()
-                    vitiligo_container2 = st.container()
-                    with vitiligo_container2:
-                        c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                        with c1:
-                            st.header("DO'S AND DONT'S")
-                            st.markdown(
-                                "<p style='font-size: 20px; text-align: justify;'> Certainly, when it comes to "
-                                "managing melanoma skin cancer, adhering to specific do's and don'ts is crucial. <br><br> ⭕Do "
-                                "conduct regular skin self-exams and promptly report any changes in moles, skin, "
-                                "or overall health to a healthcare professional. <br><br> ⭕Do protect the skin from excessive "
-                                "UV exposure by using sunscreen, wearing protective clothing, and seeking shade, "
-                                "especially during peak sun hours. <br><br> ⭕Do follow the recommended follow-up care and "
-                                "surveillance schedule post-treatment to monitor for any signs of recurrence. Don't "
-                                "ignore any unusual changes on the skin, such as new moles, changes in existing "
-                                "moles, or unusual skin growths. <br><br> ⭕Don't disregard the importance of professional "
-                                "medical advice, timely screenings, and ongoing vigilance in managing melanoma skin "
-                                "cancer.</p>", unsafe_allow_html=True)
-                        with c2:
-                            st.markdown("<p style='margin-top: 120px;'> </p>", unsafe_allow_html=True)
-                            st.image("decision.png",
-                                     width=400)
-                        space()
-                        space()
-
-                        st.divider()
-                        vitiligo_container2 = st.container()
-                        with vitiligo_container2:
-                            c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                            with c1:
-                                st.header("DIET PLAN")
-                                st.markdown(
-                                    "<p style='font-size: 20px; text-align: justify;'> ⭕A well-considered diet plan "
-                                    "for individuals with melanoma skin cancer aims to support overall health and "
-                                    "well-being. Emphasizing a diet rich in fruits, vegetables, and whole grains can "
-                                    "provide essential vitamins, minerals, and antioxidants that support the body's "
-                                    "immune system and overall health. <br><br> ⭕Including sources of omega-3 fatty acids, "
-                                    "such as fatty fish, flaxseeds, and walnuts, may offer anti-inflammatory "
-                                    "benefits. Conversely, avoiding excessive intake of processed and red meats, "
-                                    "as well as sugary and high-fat foods, is advisable. <br><br> ⭕Consulting a registered "
-                                    "dietitian for personalized nutritional guidance, considering potential "
-                                    "interactions with treatment, and addressing individual dietary needs is crucial "
-                                    "in formulating an effective and nourishing diet plan.</p>", unsafe_allow_html=True)
-                            with c2:
-                                st.markdown("<p style='margin-top: 80px;'> </p>", unsafe_allow_html=True)
-                                st.image("calories.png",
-                                         width=400)
-                            space()
-                            space()
-            elif predicted_class == "Eczema Photos":
-                    with st.expander("SYSTEM OF ECZEMA RECOMMENDATIONS"):
-                        vitiligo_container2 = st.container()
-                        with vitiligo_container2:
-                            c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                            with c1:
-                                st.header("SKIN CARE TREATMENT")
-                                st.markdown(
-                                    "<p style='font-size: 20px; text-align: justify;'> ⭕Skin cancer treatment for "
-                                    "eczema involves a tailored approach due to the delicate nature of eczematous "
-                                    "skin. Topical treatments like corticosteroids or calcineurin inhibitors may be "
-                                    "used cautiously to manage eczema while addressing any potential cancerous "
-                                    "lesions. <br><br> ⭕Regular skin checks by a dermatologist are essential to detect any "
-                                    "suspicious changes on the skin early. In cases where skin cancer is detected, "
-                                    "treatments such as surgical excision, photodynamic therapy, or immune-based "
-                                    "therapies might be considered. <br><br> ⭕Close collaboration between dermatologists and "
-                                    "oncologists is crucial to develop a comprehensive treatment plan that addresses "
-                                    "both eczema management and skin cancer treatment effectively.</p>",
-                                    unsafe_allow_html=True)
-                            with c2:
-                                st.markdown("<p style='margin-top: 40px;'> </p>", unsafe_allow_html=True)
-                                st.image("dry_skin.png",
-                                         width=400)
-                            space()
-                            space()
-                        st.divider()
-                        vitiligo_container2 = st.container()
-                        with vitiligo_container2:
-                            c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                            with c1:
-                                st.header("DO'S AND DONT'S")
-                                st.markdown(
-                                    "<p style='font-size: 20px; text-align: justify;'> When managing eczema, "
-                                    "it's crucial to adhere to specific do's and don'ts. <br><br> ⭕Do moisturize the skin "
-                                    "regularly with a gentle, fragrance-free moisturizer to maintain skin hydration "
-                                    "and reduce flare-ups. <br><br> ⭕Do identify and avoid triggers such as certain soaps, "
-                                    "detergents, and environmental allergens that exacerbate eczema symptoms. <br><br> ⭕Do use "
-                                    "mild, non-irritating skincare products and laundry detergents to minimize skin "
-                                    "irritation. <br><br> ⭕Don't scratch or rub the affected areas to prevent further skin "
-                                    "damage and infection. <br><br> ⭕Don't overlook the importance of seeking professional "
-                                    "medical advice for personalized treatment and management strategies to "
-                                    "effectively control eczema symptoms and improve overall skin health.</p>",
-                                    unsafe_allow_html=True)
-                            with c2:
-                                st.markdown("<p style='margin-top: 120px;'> </p>", unsafe_allow_html=True)
-                                st.image("decision (1).png",
-                                         width=400)
-                            space()
-                            space()
-
-                            st.divider()
-                            vitiligo_container2 = st.container()
-                            with vitiligo_container2:
-                                c1, _, c2 = st.columns([1.3, 0.05, 0.7])
-                                with c1:
-                                    st.header("DIET PLAN")
-                                    st.markdown(
-                                        "<p style='font-size: 20px; text-align: justify;'> ⭕A well-thought-out diet "
-                                        "plan for eczema focuses on maintaining skin health and reducing "
-                                        "inflammation. Include foods rich in omega-3 fatty acids like fatty fish, "
-                                        "flaxseeds, and walnuts, known for their anti-inflammatory properties that "
-                                        "may help alleviate eczema symptoms. <br><br> ⭕Incorporate fruits and vegetables high "
-                                        "in antioxidants, such as berries and leafy greens, to support skin "
-                                        "regeneration. Avoid potential trigger foods like dairy, gluten, "
-                                        "and processed foods that may exacerbate eczema flare-ups. <br><br> ⭕Hydration is key, "
-                                        "so consuming an adequate amount of water is essential to keep the skin "
-                                        "hydrated from within. Consulting a dietitian for personalized guidance can "
-                                        "be beneficial in creating an effective dietary plan tailored to individual "
-                                        "needs.</p>",
-                                        unsafe_allow_html=True)
-                                with c2:
-                                    st.markdown("<p style='margin-top: 80px;'> </p>", unsafe_allow_html=True)
-                                    st.image("calories.png",
-                                             width=400)
-                                space()
-                                space()
-            else:
-                st.error("Invalid Option")
+            with maybe_profile("predict"):
+                result = predict_disease(upload.model_input, image_bytes, upload.source)
+                counter("dermacare_predictions_total", "Predictions served, by outcome.",
+                        predicted_class=result.predicted_class, abstained=str(result.abstained).lower()).inc()
+                top_k = "<br>".join(f"{name}: {probability:.0%}"
+                                    for name, probability in zip(result.classes, result.probabilities))
+                with timer("similar_cases"):
+                    cases = pipeline.similar_cases(upload.model_input, image_bytes, config.MODEL_PATH, wait=spinner)
+                # An exact copy of a reference image is pointed out rather than given recommendations
+                reference = pipeline.reference_copy(image_bytes, config.MODEL_PATH)
+                if reference is not None:
+                    counter("dermacare_duplicate_uploads_total", "Uploads that copy a reference image.").inc()
+                    st.info(f"This photo is already in the reference set, labelled {reference.label}.")
+
+                if result.abstained:
+                    # Too uncertain to recommend anything; skip the recommendation rendering
+                    st.warning(f"The model is not confident enough to name a condition "
+                               f"({result.confidence:.0%} at most). Please consult a dermatologist.")
+                    st.markdown(f"<p style='font-size: 16px;'>{top_k}</p>", unsafe_allow_html=True)
+                else:
+                    st.success(f"The skin disease in the image is predicted as: {result.predicted_class} "
+                               f"({result.confidence:.0%} confidence)")
+                    st.markdown(f"<p style='font-size: 16px;'>{top_k}</p>", unsafe_allow_html=True)
+
+                    # Recommendation System
+                    recommendation = get_recommendation(result.predicted_class) if reference is None else None
+                    if recommendation is not None:
+                        with timer("render"):
+                            render_recommendation(recommendation)
+                    elif reference is None:
+                        st.warning(f"No recommendations are available for {result.predicted_class} yet.")
+
+                # Nearest reference images from the embedding index, if one has been built
+                if cases:
+                    st.subheader("Similar reference cases")
+                    for column, case in zip(st.columns(len(cases)), cases):
+                        with column:
+                            st.image(load_thumbnail(case.path, 200), caption=f"{case.label} ({case.score:.0%} similar)")
 
 
 # Contact
@@ -502,7 +261,7 @@ elif selected == 'Contact':
         with c1:
             space()
             space()
-            st.image("f1.gif")
+            st.image(get_asset("f1.gif"))
             space()
             st.subheader("Scientific Homeopathy Treatment")
             st.markdown("Reduces itching, Redness, Scaling")
@@ -518,7 +277,7 @@ elif selected == 'Contact':
         with c2:
             space()
             space()
-            st.image("f1.gif")
+            st.image(get_asset("f1.gif"))
             space()
             st.subheader("Dermahel For Faster Sin Healing")
             st.markdown("Visible results in 5 weeks")
@@ -533,7 +292,7 @@ elif selected == 'Contact':
         with c3:
             space()
             space()
-            st.image("f1.gif")
+            st.image(get_asset("f1.gif"))
             space()
             st.subheader("Diet Plan for Accelerated Wound Healing")
             space()
@@ -544,4 +303,11 @@ elif selected == 'Contact':
             st.markdown("They recommend consulting a healthcare professional for personalized advice.")
             space()
             st.markdown("They claim visible results in 4 weeks.")
-        st.divider()
\ No newline at end of file
+        st.divider()
+
+
+# Serve /metrics and pre-warm the model in the background now that the page has rendered
+if config.METRICS_PORT:
+    start_metrics_server(config.METRICS_PORT)
+if config.PREWARM:
+    start_prewarm(config.MODEL_PATH, PAGE_ASSETS)